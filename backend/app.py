@@ -1,12 +1,8 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-import os
-from services.ai_services import (
-    analyze_visual_performance,
-    analyze_audio_performance,
-    generate_practice_recommendations,
-    generate_performance_summary
-)
+from services.media_ingest import MediaSource
+from services.performance_pipeline import run_performance_analysis, AnalysisError
+from services.job_manager import job_manager, JobQueueFull
 from services.music_generator import music_generator
 from utils.formatters import (
     format_visual_feedback,
@@ -14,88 +10,113 @@ from utils.formatters import (
     format_recommendations
 )
 from dotenv import load_dotenv
-import sys
-import os
-
-# Add the parent directory to sys.path to import from Main.py
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from Main import get_style_rating
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
+def _get_uploaded_video():
+    """Validate the uploaded video, returning (video_file, error_response)"""
+    if 'video' not in request.files:
+        return None, (jsonify({'error': 'No video file provided'}), 400)
+    
+    video_file = request.files['video']
+    if not video_file.filename:
+        return None, (jsonify({'error': 'Empty video file'}), 400)
+        
+    # Check file type
+    if not video_file.filename.lower().endswith(('.mp4', '.mov')):
+        return None, (jsonify({'error': 'Invalid file type. Please upload MP4 or MOV file'}), 400)
+    
+    return video_file, None
+
 @app.route('/api/analyze-performance', methods=['POST'])
 def analyze_performance():
     try:
-        if 'video' not in request.files:
-            return jsonify({'error': 'No video file provided'}), 400
-        
-        video_file = request.files['video']
-        if not video_file.filename:
-            return jsonify({'error': 'Empty video file'}), 400
-            
-        # Check file type
-        if not video_file.filename.lower().endswith(('.mp4', '.mov')):
-            return jsonify({'error': 'Invalid file type. Please upload MP4 or MOV file'}), 400
-        
-        # Get raw feedback without style ratings
-        visual_feedback = analyze_visual_performance(video_file)
-        if not visual_feedback:
-            return jsonify({'error': 'Visual analysis failed. Please ensure good lighting and clear video'}), 500
-        
-        # Reset file pointer for audio analysis
-        video_file.seek(0)
-        audio_feedback = analyze_audio_performance(video_file)
-        if not audio_feedback:
-            return jsonify({'error': 'Audio analysis failed. Please ensure clear audio'}), 500
-        
-        # Add style ratings to each aspect of visual feedback
-        for aspect in visual_feedback:
-            if aspect != "score":
-                visual_feedback[aspect]["style_rating"] = get_style_rating(visual_feedback[aspect]["score"])
-                
-        # Add style ratings to each aspect of audio feedback
-        for aspect in audio_feedback:
-            if aspect != "score":
-                audio_feedback[aspect]["style_rating"] = get_style_rating(audio_feedback[aspect]["score"])
-        
-        education_tips = generate_practice_recommendations(
-            visual_feedback,
-            audio_feedback,
-            skill_level='intermediate'
-        )
-        
-        # Calculate grades using the imported get_style_rating
-        visual_grade = get_style_rating(visual_feedback["score"])
-        audio_grade = get_style_rating(audio_feedback["score"])
-        
-        # Calculate overall grade with ULTRA condition
-        if visual_grade[0] == "SSS" and audio_grade[0] == "SSS":
-            overall_grade = ("ULTRA", "#FFD700")
-        else:
-            overall_score = (visual_feedback["score"] + audio_feedback["score"]) / 2
-            overall_grade = get_style_rating(overall_score)
-        
-        # Generate overall performance summary
-        performance_summary = generate_performance_summary(visual_feedback, audio_feedback)
+        video_file, error_response = _get_uploaded_video()
+        if error_response:
+            return error_response
         
-        return jsonify({
-            'visual_feedback': visual_feedback,
-            'audio_feedback': audio_feedback,
-            'education_tips': education_tips,
-            'summary': {
-                'visual_grade': visual_grade,
-                'audio_grade': audio_grade,
-                'overall_grade': overall_grade,
-                'performance_summary': performance_summary
-            }
-        })
+        with MediaSource.from_upload(video_file) as media:
+            return jsonify(run_performance_analysis(media))
+    except AnalysisError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         print(f"Error in analyze_performance: {e}")
         return jsonify({'error': 'Analysis failed. Please try again'}), 500
 
+def _run_analysis_job(media, report_progress):
+    """Worker entry point: analyze an upload already spooled to disk"""
+    try:
+        return run_performance_analysis(media, report_progress=report_progress)
+    except AnalysisError:
+        raise
+    except Exception as e:
+        print(f"Error in analysis job: {e}")
+        raise AnalysisError('Analysis failed. Please try again')
+
+def _job_status_payload(job):
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'partial_results': job['partial'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+
+@app.route('/api/analyze-performance/jobs', methods=['POST'])
+def submit_analysis_job():
+    media = None
+    try:
+        video_file, error_response = _get_uploaded_video()
+        if error_response:
+            return error_response
+        
+        # Spool the upload to disk so the worker can outlive this request
+        media = MediaSource.from_upload(video_file)
+        job_id = job_manager.submit(_run_analysis_job, media, cleanup=media.close)
+    except JobQueueFull as e:
+        media.close()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        print(f"Error in submit_analysis_job: {e}")
+        if media is not None:
+            media.close()
+        return jsonify({'error': 'Could not start analysis. Please try again'}), 500
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/analyze-performance/jobs/{job_id}",
+        'result_url': f"/api/analyze-performance/jobs/{job_id}/result"
+    }), 202
+
+@app.route('/api/analyze-performance/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    return jsonify(_job_status_payload(job))
+
+@app.route('/api/analyze-performance/jobs/<job_id>/result', methods=['GET'])
+def get_analysis_job_result(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    if job['status'] == 'completed':
+        return jsonify(job['result'])
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), job['status_code']
+    
+    # Still queued or running
+    return jsonify(_job_status_payload(job)), 202
+
 @app.route('/api/generate-practice-song', methods=['POST'])
 def generate_practice_song():
     data = request.get_json()
@@ -1,8 +1,10 @@
 from transformers import pipeline, AutoFeatureExtractor, AutoModelForAudioClassification
-import librosa
 import numpy as np
 import torch
 from typing import Dict, List, Tuple
+from .audio_features import AudioFeatures
+from .audio_stream import StreamingAudioFeatures
+from .audio_loader import audio_loader, resample, task_sample_rate
 
 class MusicAIAnalyzer:
     def __init__(self):
@@ -21,16 +23,29 @@ class MusicAIAnalyzer:
             "microsoft/music-audio-detection"
         )
         
-    def analyze_performance(self, audio_file: str) -> Dict:
-        """Analyze a music performance and provide detailed feedback"""
-        # Load audio file
-        y, sr = librosa.load(audio_file, sr=22050)
+    def analyze_performance(self, audio_file: str, streaming: bool = False) -> Dict:
+        """
+        Analyze a music performance and provide detailed feedback
+        streaming=True decodes and analyzes the file block by block with flat memory;
+        the quality model then sees only the opening excerpt
+        """
+        model_sr = getattr(self.feature_extractor, 'sampling_rate', None) or task_sample_rate('model')
+        if streaming:
+            features = StreamingAudioFeatures.from_path(audio_file, sr=task_sample_rate('analysis'))
+            beat_features = features
+            model_input = resample(features.excerpt, features.sr, model_sr)
+        else:
+            # Each analysis loads the file at the rate it needs; decodes are cached per rate
+            y, sr = audio_loader.load(audio_file, 'analysis')
+            features = AudioFeatures(y, sr)
+            beat_features = AudioFeatures(*audio_loader.load(audio_file, 'beat'))
+            model_input, _ = audio_loader.load(audio_file, sr=model_sr)
         
         # Get various analyses
         instrument = self._detect_instrument(audio_file)
-        tune_analysis = self._analyze_tune(y, sr)
-        quality_score = self._assess_quality(y, sr)
-        technical_analysis = self._analyze_technical_aspects(y, sr)
+        tune_analysis = self._analyze_tune(features)
+        quality_score = self._assess_quality(model_input, model_sr)
+        technical_analysis = self._analyze_technical_aspects(beat_features)
         
         # Compile feedback
         feedback = self._generate_feedback(
@@ -57,28 +72,20 @@ class MusicAIAnalyzer:
             "possible_others": [p["label"] for p in predictions[1:3]]
         }
     
-    def _analyze_tune(self, y: np.ndarray, sr: int) -> Dict:
+    def _analyze_tune(self, features) -> Dict:
         """Analyze the tuning and pitch accuracy"""
-        # Extract pitch
-        pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-        
-        # Get the most prominent pitches
-        pitch_values = []
-        for t in range(pitches.shape[1]):
-            index = magnitudes[:, t].argmax()
-            pitch_values.append(pitches[index, t])
-        
-        # Calculate pitch stability
-        pitch_std = np.std(pitch_values)
-        pitch_stability = np.exp(-pitch_std)
+        # Intonation of the f0 contour against the semitone grid
+        contour = features.pitch_contour
+        pitch_stability = contour.intonation_stability
         
         # Detect key
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        key_correlation = np.corrcoef(chroma)
+        key_correlation = features.chroma_correlation
         key_stability = np.mean(np.diag(key_correlation, k=1))
         
         return {
             "pitch_stability": float(pitch_stability),
+            "intonation_accuracy": contour.intonation_accuracy,
+            "cents_deviation": contour.mean_abs_cents,
             "key_stability": float(key_stability),
             "overall_tune_score": float((pitch_stability + key_stability) / 2)
         }
@@ -101,18 +108,17 @@ class MusicAIAnalyzer:
             "confidence": float(torch.max(scores))
         }
     
-    def _analyze_technical_aspects(self, y: np.ndarray, sr: int) -> Dict:
+    def _analyze_technical_aspects(self, features) -> Dict:
         """Analyze technical aspects of the performance"""
         # Rhythm analysis
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+        tempo, beats = features.beats
         
         # Timing consistency
         beat_intervals = np.diff(beats)
         timing_consistency = 1.0 - (np.std(beat_intervals) / np.mean(beat_intervals))
         
         # Dynamic range
-        rms = librosa.feature.rms(y=y)[0]
+        rms = features.rms
         dynamic_range = np.max(rms) - np.min(rms)
         
         return {
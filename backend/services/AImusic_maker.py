@@ -5,10 +5,10 @@ import aiofiles
 import base64
 from pathlib import Path
 import tempfile
-import librosa
-import numpy as np
-from music21 import converter, stream, note, instrument, tablature
+from music21 import stream, note, instrument, tablature
 from dotenv import load_dotenv
+from .audio_loader import audio_loader
+from .transcription import transcribe, notes_to_music21
 
 class EnhancedMusicGenerator:
     def __init__(self):
@@ -45,13 +45,10 @@ class EnhancedMusicGenerator:
     async def generate_sheet_music(self, audio_path, instrument_type='piano'):
         """Generate sheet music for different instruments"""
         try:
-            # Convert audio to MIDI
-            midi_data = await self._audio_to_midi(audio_path)
-            if not midi_data:
+            # Transcribe audio to a base score
+            score = await self._audio_to_midi(audio_path)
+            if score is None:
                 raise Exception("Failed to convert audio to MIDI")
-
-            # Create base score from MIDI
-            score = converter.parse(midi_data)
             
             # Generate different formats based on instrument type
             output_dir = Path("generated_sheet_music").resolve()
@@ -214,45 +211,16 @@ class EnhancedMusicGenerator:
                 raise Exception({"error": f"Failed to download track: {str(e)}"})
 
     async def _audio_to_midi(self, audio_path):
-        """Convert audio to MIDI using librosa"""
+        """Transcribe audio to a music21 stream with the shared note transcription"""
         try:
-            # Load the audio file
-            y, sr = librosa.load(audio_path, sr=22050, mono=True)
-            
-            # Extract pitch and onset information
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-            onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
-            
-            # Create MIDI data
-            midi_stream = stream.Stream()
-            
-            # Convert detected pitches to notes
-            onset_times = librosa.frames_to_time(onset_frames, sr=sr)
+            # Load the audio file; repeat calls for other instruments hit the cache
+            y, sr = audio_loader.load(audio_path, 'transcription')
             
-            for i in range(len(onset_times)-1):
-                start_time = onset_times[i]
-                end_time = onset_times[i+1]
-                
-                frame_start = librosa.time_to_frames(start_time, sr=sr)
-                frame_end = librosa.time_to_frames(end_time, sr=sr)
-                
-                if frame_start >= len(pitches) or frame_end >= len(pitches):
-                    continue
-                    
-                pitch_segment = pitches[frame_start:frame_end]
-                mag_segment = magnitudes[frame_start:frame_end]
-                
-                if len(pitch_segment) > 0:
-                    pitch_idx = np.unravel_index(mag_segment.argmax(), mag_segment.shape)
-                    midi_pitch = int(round(pitch_segment[pitch_idx]))
-                    
-                    if 0 <= midi_pitch <= 127:
-                        new_note = note.Note(midi_pitch)
-                        new_note.quarterLength = end_time - start_time
-                        midi_stream.append(new_note)
+            notes = transcribe(y, sr)
+            if not len(notes):
+                return None
             
-            # Convert to MIDI file
-            return midi_stream
+            return notes_to_music21(notes)
             
         except Exception as e:
             print(f"Error converting audio to MIDI: {e}")
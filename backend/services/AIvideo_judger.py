@@ -1,10 +1,28 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, astuple
 import time
 import os
+import re
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from openai import OpenAI
+from .frame_pipeline import prefetch, BackgroundVideoWriter
+from .frame_hash import DuplicateFilter
+from .frame_features import downscale_for_analysis
+from .vlm_score_cache import VLMScoreCache
+from .landmark_detection import (
+    DETECTOR_KINDS, StagedDetectors, CascadeDetectors, LandmarkRecorder, create_detector, detect
+)
+from .streaming_stats import RunningStats, MetricTimeline
+
+NEBIUS_MODEL = "Qwen/Qwen2-VL-72B-Instruct"
+NEBIUS_PROMPT = "Analyze this performer's engagement and technique. Rate from 0-1."
+# Strict reply format so scores can be matched to frames by position
+NEBIUS_REPLY_FORMAT = ("Reply with only a JSON array of {count} numbers between 0 and 1, "
+                       "one per image in the order given, for example {example}.")
 
 @dataclass
 class PerformanceMetrics:
@@ -14,6 +32,8 @@ class PerformanceMetrics:
     ai_score: float = 0.0
     total_score: float = 0.0
 
+METRIC_NAMES = tuple(field.name for field in fields(PerformanceMetrics))
+
 class PerformanceAnalyzer:
     def __init__(self):
         # Initialize MediaPipe solutions
@@ -28,132 +48,393 @@ class PerformanceAnalyzer:
             api_key=os.environ.get("NEBIUS_API_KEY"),
         )
         
-        # Initialize detectors with custom configs
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # In-process MediaPipe graphs, built on first use by the "sequential" and
+        # "cascade" modes; "staged" builds its own in the worker processes
+        self._in_process_detectors = None
         
-        self.hands = self.mp_hands.Hands(
-            max_num_hands=2,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
+        # Detector scheduling:
+        #   "staged"     - the three detectors run as parallel worker-process stages
+        #                  on frames downscaled to detector_max_side
+        #   "cascade"    - pose first, then face and hands on crops around the
+        #                  head and wrists, full frame when tracking is lost
+        #   "sequential" - all three in this process, on frames downscaled to
+        #                  detector_max_side
+        self.detector_mode = "staged"
+        self.detector_max_side = 640
+        self._previous_landmarks = {}
         
         # Frame skip settings
         self.frame_sample_rate = 0.1  # Analyze 10% of frames
         
-    def _analyze_frame_with_nebius(self, frame):
-        # Convert frame to base64
-        success, encoded_image = cv2.imencode('.jpg', frame)
+        # Vision model scoring: concurrent requests, images packed per request,
+        # per-call timeout (seconds), retries and input size
+        self.vlm_concurrency = 4
+        self.vlm_images_per_request = 1
+        self.vlm_timeout = 30.0
+        self.vlm_retries = 2
+        self.vlm_retry_backoff = 1.0
+        self.vlm_max_side = 512
+        # Batches queued or running at once; frame encoding waits beyond this
+        self.vlm_max_in_flight = 2 * self.vlm_concurrency
+        
+        # Reuse scores for frames that look like ones the model has already seen
+        self.vlm_cache = VLMScoreCache()
+        self.vlm_cache_namespace = VLMScoreCache.namespace(NEBIUS_MODEL, NEBIUS_PROMPT + NEBIUS_REPLY_FORMAT)
+        
+    def _prepare_frame_for_vlm(self, frame):
+        """
+        Downscale a frame for the vision model
+        Returns (cached_score, None, frame_hash) on a cache hit,
+        otherwise (None, base64_jpeg, frame_hash); base64_jpeg is None if encoding fails
+        """
+        small = downscale_for_analysis(frame, self.vlm_max_side)
+        frame_hash = VLMScoreCache.frame_hash(small)
+        cached_score = self.vlm_cache.get(frame_hash, self.vlm_cache_namespace)
+        if cached_score is not None:
+            return cached_score, None, frame_hash
+        
+        success, encoded_image = cv2.imencode('.jpg', small)
         if not success:
-            return 0.0
-            
-        base64_image = encoded_image.tobytes()
+            return None, None, frame_hash
+        return None, base64.b64encode(encoded_image.tobytes()).decode('utf-8'), frame_hash
+    
+    def _request_vlm_scores(self, images):
+        """
+        Score one or more base64 images in a single Nebius request
+        Retries with exponential backoff; returns one 0-1 score per image, or
+        all None if the request failed or the reply did not match the format
+        """
+        example = json.dumps([0.7] * len(images))
+        prompt = f"{NEBIUS_PROMPT} {NEBIUS_REPLY_FORMAT.format(count=len(images), example=example)}"
+        if len(images) > 1:
+            prompt = f"{prompt} There are {len(images)} frames of the same performance."
+        content = [{"type": "text", "text": prompt}] + [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{image}"
+                },
+            }
+            for image in images
+        ]
         
-        try:
-            response = self.nebius_client.chat.completions.create(
-                model="Qwen/Qwen2-VL-72B-Instruct",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Analyze this performer's engagement and technique. Rate from 0-1."},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                },
-                            },
-                        ],
-                    }
-                ],
-                max_tokens=100,
-            )
-            
-            # Extract score from response
-            score_text = response.choices[0].message.content
+        client = self.nebius_client.with_options(timeout=self.vlm_timeout, max_retries=0)
+        for attempt in range(self.vlm_retries + 1):
             try:
-                score = float(score_text)
-                return min(max(score, 0.0), 1.0)  # Ensure score is between 0 and 1
-            except ValueError:
-                return 0.0
-                
-        except Exception as e:
-            print(f"Error in Nebius AI analysis: {e}")
+                response = client.chat.completions.create(
+                    model=NEBIUS_MODEL,
+                    messages=[{"role": "user", "content": content}],
+                    max_tokens=100,
+                )
+                break
+            except Exception as e:
+                print(f"Error in Nebius AI analysis (attempt {attempt + 1}): {e}")
+                if attempt == self.vlm_retries:
+                    return [None] * len(images)
+                time.sleep(self.vlm_retry_backoff * (2 ** attempt))
+        
+        scores = self._parse_vlm_scores(response.choices[0].message.content or "", len(images))
+        if scores is None:
+            print(f"Discarding Nebius reply that is not a JSON array of {len(images)} scores")
+            return [None] * len(images)
+        return scores
+    
+    @staticmethod
+    def _parse_vlm_scores(text, count):
+        """
+        Scores from the first JSON array in a reply, or None unless it holds exactly
+        count numbers in 0-1; a partial or rescaled answer cannot be matched to frames
+        """
+        match = re.search(r'\[[^\[\]]*\]', text)
+        if not match:
+            return None
+        try:
+            values = json.loads(match.group(0))
+        except ValueError:
+            return None
+        if len(values) != count:
+            return None
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            return None
+        if not all(0.0 <= value <= 1.0 for value in values):
+            return None
+        return [float(value) for value in values]
+    
+    def _analyze_frame_with_nebius(self, frame):
+        cached_score, image, frame_hash = self._prepare_frame_for_vlm(frame)
+        if cached_score is not None:
+            return cached_score
+        if image is None:
+            return 0.0
+        score = self._request_vlm_scores([image])[0]
+        if score is None:
             return 0.0
+        self.vlm_cache.put(frame_hash, self.vlm_cache_namespace, score)
+        return score
+    
+    def _submit_vlm_batch(self, executor, batch, futures, in_flight):
+        """
+        Send a batch of (metrics_index, image, frame_hash) tuples as one request
+        Blocks while vlm_max_in_flight batches are queued or running, so the encoded
+        frames held for the model stay bounded however long the video is
+        """
+        if not batch:
+            return
+        while len(in_flight) >= self.vlm_max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.difference_update(done)
+        indices = [index for index, _, _ in batch]
+        images = [image for _, image, _ in batch]
+        hashes = [frame_hash for _, _, frame_hash in batch]
+        future = executor.submit(self._request_vlm_scores, images)
+        in_flight.add(future)
+        futures.append((indices, hashes, future))
+    
+    def _join_vlm_scores(self, futures, timeline, scores):
+        """
+        Wait for outstanding VLM requests and fill in ai_score/total_score by row
+        scores already holds cache hits; new scores are added to the cache
+        """
+        for indices, hashes, future in futures:
+            for index, frame_hash, score in zip(indices, hashes, future.result()):
+                if score is None:
+                    score = 0.0
+                else:
+                    self.vlm_cache.put(frame_hash, self.vlm_cache_namespace, score)
+                scores[index] = score
+        self.vlm_cache.save()
+        
+        ai_scores = timeline.column("ai_score")
+        for index in range(len(timeline)):
+            if index in scores:
+                ai_scores[index] = scores[index]
+            elif index > 0:
+                # Near-duplicate frames share the score of the frame they copied
+                ai_scores[index] = ai_scores[index - 1]
+        
+        # The weighting is elementwise, so it applies to whole columns at once
+        columns = PerformanceMetrics(**{name: timeline.column(name) for name in METRIC_NAMES})
+        timeline.column("total_score")[:] = self._calculate_total_score(columns)
+    
+    def _sampled_frames(self, cap, frame_interval):
+        """Yield (frame_idx, frame, frame_rgb) for sampled frames, grabbing past the rest"""
+        frame_idx = 0
+        while True:
+            if frame_idx % frame_interval != 0:
+                # Skip frames based on sample rate without decoding them
+                if not cap.grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                # Convert BGR to RGB
+                yield frame_idx, frame, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            frame_idx += 1
+    
+    def _detector_inputs(self, frames, duplicates, max_side):
+        """
+        Turn decoded frames into ((frame_idx, frame), frame_rgb) detector inputs
+        Near-duplicate frames get frame_rgb None so the detectors skip them
+        """
+        for frame_idx, frame, frame_rgb in frames:
+            if duplicates.is_duplicate(frame):
+                yield (frame_idx, frame), None
+            else:
+                yield (frame_idx, frame), downscale_for_analysis(frame_rgb, max_side)
     
-    def process_video(self, video_path, display=True):
+    def _detectors(self):
+        if self._in_process_detectors is None:
+            self._in_process_detectors = {kind: create_detector(kind) for kind in DETECTOR_KINDS}
+        return self._in_process_detectors
+    
+    def _detect_sequential(self, items):
+        """In-process fallback with the same interface as StagedDetectors.map"""
+        detectors = self._detectors()
+        for payload, frame_rgb in items:
+            if frame_rgb is None:
+                yield payload, None
+            else:
+                yield payload, {kind: detect(kind, detector, frame_rgb) for kind, detector in detectors.items()}
+    
+    def process_video(self, video_path, display=True, landmarks_path=None, annotated_video_path=None):
+        """
+        Score a performance video frame by frame
+        display=False runs headless: no GUI windows and no per-frame progress output
+        landmarks_path saves per-frame landmarks and metrics as a compressed .npz;
+        annotated_video_path renders the sampled frames with overlays on a background encoder
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError("Error opening video file")
             
-        metrics_history = []
-        frame_count = 0
+        # Per-frame metrics are float32 rows, not objects; the VLM join fills them in by row
+        timeline = MetricTimeline(METRIC_NAMES)
+        metrics = None
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         frame_interval = int(1 / self.frame_sample_rate)
+        self._previous_landmarks = {}
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        recorder = None
+        if landmarks_path:
+            recorder = LandmarkRecorder(
+                -(-total_frames // frame_interval),
+                METRIC_NAMES
+            )
+        
+        writer = None
+        if annotated_video_path:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            writer = BackgroundVideoWriter(annotated_video_path, fps / frame_interval, frame_size)
+        last_landmarks = {}
+        
+        # Static shots repeat themselves; reuse metrics for near-identical frames
+        duplicates = DuplicateFilter()
+        
+        # Vision model calls run concurrently in batches and are joined after the loop
+        vlm_executor = ThreadPoolExecutor(max_workers=self.vlm_concurrency, thread_name_prefix='nebius')
+        vlm_futures = []
+        vlm_in_flight = set()
+        vlm_batch = []
+        vlm_scores = {}
+        
+        # Decode ahead on a background thread while the detector stages run
+        frames = prefetch(self._sampled_frames(cap, frame_interval))
+        stages = StagedDetectors() if self.detector_mode == "staged" else None
+        cascade = None
+        try:
+            if stages:
+                detections = stages.map(self._detector_inputs(frames, duplicates, self.detector_max_side))
+            elif self.detector_mode == "cascade":
+                # Crops are taken from the full-resolution frame
+                cascade = CascadeDetectors(self._detectors())
+                detections = cascade.map(self._detector_inputs(frames, duplicates, None))
+            else:
+                detections = self._detect_sequential(self._detector_inputs(frames, duplicates, self.detector_max_side))
+            for (frame_idx, frame), landmarks in detections:
+                if landmarks is None and metrics is not None:
+                    timeline.repeat_last()
+                    if recorder:
+                        recorder.repeat_last(frame_idx)
+                    if writer:
+                        self._draw_landmarks(frame, last_landmarks)
+                        self._draw_scores(frame, metrics)
+                        writer.write(frame)
+                    continue
+                landmarks = last_landmarks = landmarks or {}
+                if recorder:
+                    recorder.record(frame_idx, landmarks)
                 
-            # Skip frames based on sample rate
-            if frame_count % frame_interval != 0:
-                frame_count += 1
-                continue
+                # Queue AI analysis for this frame; its score is filled in after the loop
+                cached_score, image, frame_hash = self._prepare_frame_for_vlm(frame)
+                if cached_score is not None:
+                    vlm_scores[len(timeline)] = cached_score
+                elif image is not None:
+                    vlm_batch.append((len(timeline), image, frame_hash))
+                    if len(vlm_batch) >= self.vlm_images_per_request:
+                        self._submit_vlm_batch(vlm_executor, vlm_batch, vlm_futures, vlm_in_flight)
+                        vlm_batch = []
+                else:
+                    # Encoding failed; score it 0 rather than copying the previous frame
+                    vlm_scores[len(timeline)] = 0.0
                 
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Process frame with all detectors
-            face_results = self.face_mesh.process(frame_rgb)
-            pose_results = self.pose.process(frame_rgb)
-            hands_results = self.hands.process(frame_rgb)
-            
-            # Get AI analysis for this frame
-            ai_score = self._analyze_frame_with_nebius(frame)
-            
-            # Calculate metrics for this frame
-            metrics = PerformanceMetrics()
-            
-            if face_results.multi_face_landmarks:
-                metrics.facial_engagement = self._analyze_facial_movement(
-                    face_results.multi_face_landmarks[0])
+                # Calculate metrics for this frame from the merged landmarks
+                metrics = PerformanceMetrics()
+                metrics.facial_engagement = self._analyze_facial_movement(landmarks.get("face"))
+                metrics.body_movement = self._analyze_body_movement(landmarks.get("pose"))
+                metrics.hand_activity = self._analyze_hand_movement(landmarks.get("hands"))
                 
-            if pose_results.pose_landmarks:
-                metrics.body_movement = self._analyze_body_movement(
-                    pose_results.pose_landmarks)
+                metrics.total_score = self._calculate_total_score(metrics)
+                timeline.append(astuple(metrics))
                 
-            if hands_results.multi_hand_landmarks:
-                metrics.hand_activity = self._analyze_hand_movement(
-                    hands_results.multi_hand_landmarks)
+                if display or writer:
+                    self._draw_landmarks(frame, landmarks)
+                    self._draw_scores(frame, metrics)
+                if writer:
+                    writer.write(frame)
+                if display:
+                    cv2.imshow('Performance Analysis', frame)
+                    
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                        
+                    print(f"Processed frame {frame_idx + 1}/{total_frames} ({((frame_idx + 1)/total_frames*100):.1f}%)")
             
-            metrics.ai_score = ai_score
-            metrics.total_score = self._calculate_total_score(metrics)
-            metrics_history.append(metrics)
+            self._submit_vlm_batch(vlm_executor, vlm_batch, vlm_futures, vlm_in_flight)
+            self._join_vlm_scores(vlm_futures, timeline, vlm_scores)
             
+            if recorder:
+                recorder.set_metrics(timeline.rows())
+                recorder.save(landmarks_path, frame_interval=frame_interval, total_frames=total_frames)
+        finally:
+            if stages:
+                stages.close()
+            if cascade:
+                cascade.close()
+            if writer:
+                writer.close()
+            frames.close()
+            cap.release()
             if display:
-                self._draw_landmarks(frame, face_results, pose_results, hands_results)
-                self._draw_scores(frame, metrics)
-                cv2.imshow('Performance Analysis', frame)
-                
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-                    
-            frame_count += 1
-            print(f"Processed frame {frame_count}/{total_frames} ({(frame_count/total_frames*100):.1f}%)")
-            
-        cap.release()
-        cv2.destroyAllWindows()
+                cv2.destroyAllWindows()
+            vlm_executor.shutdown(wait=False, cancel_futures=True)
         
-        return self._summarize_performance(metrics_history)
+        if not display:
+            print(f"Processed {len(timeline)} sampled frames of {video_path}")
+        return self._summarize_performance(timeline)
+    
+    def process_video_headless(self, video_path, landmarks_path, annotated_video_path=None):
+        """Batch entry point: no GUI, landmarks saved to landmarks_path"""
+        return self.process_video(
+            video_path,
+            display=False,
+            landmarks_path=landmarks_path,
+            annotated_video_path=annotated_video_path
+        )
+    
+    def _landmark_motion(self, kind, landmarks, scale):
+        """
+        Mean image-plane displacement of a landmark set since the last frame
+        it was seen in, scaled to 0-1
+        """
+        previous = self._previous_landmarks.get(kind)
+        self._previous_landmarks[kind] = landmarks
+        if landmarks is None or previous is None or previous.shape != landmarks.shape:
+            return 0.0
+        displacement = np.linalg.norm(landmarks[..., :2] - previous[..., :2], axis=-1).mean()
+        return float(min(displacement * scale, 1.0))
+    
+    def _analyze_facial_movement(self, face_landmarks):
+        # Expressions move landmarks far less than limbs do
+        return self._landmark_motion("face", face_landmarks, scale=50.0)
+    
+    def _analyze_body_movement(self, pose_landmarks):
+        return self._landmark_motion("pose", pose_landmarks, scale=20.0)
+    
+    def _analyze_hand_movement(self, hand_landmarks):
+        return self._landmark_motion("hands", hand_landmarks, scale=10.0)
+    
+    def _draw_landmarks(self, frame, landmarks):
+        h, w = frame.shape[:2]
+        colors = {"face": (255, 255, 0), "pose": (0, 255, 0), "hands": (0, 0, 255)}
+        for kind, points in landmarks.items():
+            if points is None:
+                continue
+            for x, y, _ in points.reshape(-1, 3):
+                cv2.circle(frame, (int(x * w), int(y * h)), 2, colors[kind], -1)
+    
+    def _summarize_performance(self, timeline):
+        if not len(timeline):
+            return {"frames_analyzed": 0}
+        statistics = {
+            name: RunningStats.from_values(timeline.column(name), low=0.0, high=1.0)
+            for name in METRIC_NAMES
+        }
+        summary = {name: stats.mean for name, stats in statistics.items()}
+        summary["frames_analyzed"] = len(timeline)
+        summary["statistics"] = {name: stats.to_dict() for name, stats in statistics.items()}
+        return summary
     
     def _calculate_total_score(self, metrics):
         # Updated weights to include AI score
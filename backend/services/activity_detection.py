@@ -0,0 +1,126 @@
+import numpy as np
+import librosa
+
+from .analysis_config import (
+    ACTIVITY_ENERGY_DB,
+    ACTIVITY_MAX_FLATNESS,
+    ACTIVITY_MIN_GAP,
+    ACTIVITY_MIN_RUN,
+    ACTIVITY_PADDING,
+    AUDIO_STREAM_BLOCK_SECONDS
+)
+from .audio_decode import stream_pcm, NoAudioStream
+from .audio_loader import task_sample_rate
+
+
+def activity_features(blocks, frame_length=1024, hop_length=512):
+    """
+    Per-frame RMS and spectral flatness over a stream of mono PCM blocks
+    Frames are not centred; the samples left after the last full hop carry into the next block
+    """
+    carry = np.zeros(0, dtype=np.float32)
+    rms_parts, flatness_parts = [], []
+    for block in blocks:
+        signal = np.concatenate([carry, block])
+        if len(signal) < frame_length:
+            carry = signal
+            continue
+        n_frames = 1 + (len(signal) - frame_length) // hop_length
+        used = (n_frames - 1) * hop_length + frame_length
+        carry = signal[n_frames * hop_length:]
+
+        magnitude = np.abs(librosa.stft(signal[:used], n_fft=frame_length, hop_length=hop_length, center=False))
+        rms_parts.append(librosa.feature.rms(S=magnitude, frame_length=frame_length)[0])
+        flatness_parts.append(librosa.feature.spectral_flatness(S=magnitude)[0])
+
+    if not rms_parts:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(rms_parts), np.concatenate(flatness_parts)
+
+
+def _runs(mask):
+    """(starts, ends) of the True runs in a boolean array, ends exclusive"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def active_segments(rms, flatness, frame_rate, energy_db=ACTIVITY_ENERGY_DB,
+                    max_flatness=ACTIVITY_MAX_FLATNESS, min_gap=ACTIVITY_MIN_GAP,
+                    min_run=ACTIVITY_MIN_RUN):
+    """
+    Frame ranges where someone is playing or singing: loud enough relative to the
+    recording's loud passages and tonal rather than noise-like
+    Gaps shorter than min_gap seconds are bridged; runs shorter than min_run are dropped
+    """
+    if not len(rms):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Loudness against the 95th percentile so a single clap does not set the reference
+    reference = max(float(np.percentile(rms, 95)), 1e-8)
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10) / reference)
+    active = (level_db > -energy_db) & (flatness < max_flatness)
+
+    starts, ends = _runs(active)
+    if not len(starts):
+        return starts, ends
+    keep = (starts[1:] - ends[:-1]) >= min_gap * frame_rate
+    starts = starts[np.concatenate([[True], keep])]
+    ends = ends[np.concatenate([keep, [True]])]
+
+    long_enough = (ends - starts) >= min_run * frame_rate
+    return starts[long_enough], ends[long_enough]
+
+
+def find_performance_span(blocks, sr, frame_length=1024, hop_length=512, padding=ACTIVITY_PADDING):
+    """
+    Returns (start, end, total_duration) in seconds, start/end None when no
+    performance was found
+    The span runs from the first to the last sustained active segment, padded
+    """
+    rms, flatness = activity_features(blocks, frame_length, hop_length)
+    total_duration = ((len(rms) - 1) * hop_length + frame_length) / sr if len(rms) else 0.0
+    starts, ends = active_segments(rms, flatness, sr / hop_length)
+    if not len(starts):
+        return None, None, total_duration
+
+    start = max(0.0, starts[0] * hop_length / sr - padding)
+    end = min(total_duration, ((ends[-1] - 1) * hop_length + frame_length) / sr + padding)
+    return start, end, total_duration
+
+
+def detect_performance_span(media):
+    """
+    Finds the performance inside a MediaSource's audio and stores it as media.span
+    so both branches skip the dead time; returns the bounds for the response
+    The audio is streamed at the low activity rate and never held whole
+    A video without an audio track is analyzed whole
+    """
+    sr = task_sample_rate('activity')
+    blocks = stream_pcm(media.path, sr, block_size=int(AUDIO_STREAM_BLOCK_SECONDS * sr))
+    try:
+        start, end, total_duration = find_performance_span(blocks, sr)
+    except NoAudioStream:
+        print(f"No audio track in {media.filename}; analyzing the whole video")
+        media.has_audio = False
+        start, end, total_duration = None, None, media.probe()["duration"]
+
+    if start is None or (start <= 0.0 and end >= total_duration):
+        media.span = None
+        total_duration = round(total_duration, 3)
+        return {
+            "start": 0.0,
+            "end": total_duration,
+            "duration": total_duration,
+            "source_duration": total_duration,
+            "trimmed": False
+        }
+
+    media.span = (start, end)
+    print(f"Performance detected from {start:.1f}s to {end:.1f}s of {total_duration:.1f}s")
+    return {
+        "start": round(start, 3),
+        "end": round(end, 3),
+        "duration": round(end - start, 3),
+        "source_duration": round(total_duration, 3),
+        "trimmed": True
+    }
@@ -4,12 +4,24 @@ from dotenv import load_dotenv
 import requests
 from .video_processor import extract_frames
 from .audio_processor import extract_audio, analyze_technical_aspects
-from utils.formatters import format_visual_feedback, format_audio_feedback, format_recommendations
-import tempfile
-import cv2
+from .media_ingest import as_media_source
+from .frame_sampler import FrameSampler
+from .segment_analysis import analyze_segments, aggregate_means
+from .analysis_config import VISUAL_KEEP_TIMELINE
+from .frame_features import (
+    compute_frame_features,
+    posture_score,
+    movement_score,
+    technique_score
+)
+from utils.formatters import (
+    format_visual_feedback,
+    format_audio_feedback,
+    format_recommendations,
+    iter_feedback_aspects
+)
 import numpy as np
 import librosa
-import shutil
 
 # Load environment variables at the start
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
@@ -32,16 +44,7 @@ def analyze_posture(frame):
     """Analyze expressiveness in a single frame"""
     print("Analyzing expressiveness...")
     try:
-        # Convert frame to grayscale for processing
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # More varied analysis for expressiveness
-        height, width = gray.shape
-        center_mass = np.mean(gray[height//3:2*height//3, width//3:2*width//3])
-        variance = np.std(gray) * 2  # Add variance for more dynamic scoring
-        
-        # Normalize score between 0 and 10 with more range
-        score = min(10, max(0, (center_mass / 25.5) + (variance / 25.5)))
+        score = posture_score(compute_frame_features(frame))
         print(f"Expressiveness score: {score:.2f}")
         return score
         
@@ -53,16 +56,7 @@ def analyze_movement(frame):
     """Analyze movement in a single frame"""
     print("Analyzing movement...")
     try:
-        # Convert frame to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Enhanced movement analysis
-        motion = np.std(gray)
-        edges = cv2.Canny(gray, 100, 200)
-        edge_density = np.sum(edges) / (gray.shape[0] * gray.shape[1])
-        
-        # Combine multiple factors for more varied scoring
-        score = min(10, max(0, (motion / 20.0) + (edge_density * 5)))
+        score = movement_score(compute_frame_features(frame))
         print(f"Movement score: {score:.2f}")
         return score
         
@@ -74,16 +68,7 @@ def analyze_technique(frame):
     """Analyze technique in a single frame"""
     print("Analyzing technique...")
     try:
-        # Convert frame to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Enhanced technique analysis
-        edges = cv2.Canny(gray, 100, 200)
-        edge_score = np.sum(edges) / (gray.shape[0] * gray.shape[1])
-        texture = np.std(gray) / 25.5
-        
-        # Combine factors for more dynamic scoring
-        score = min(10, max(0, (edge_score * 8) + (texture * 2)))
+        score = technique_score(compute_frame_features(frame))
         print(f"Technique score: {score:.2f}")
         return score
         
@@ -91,6 +76,22 @@ def analyze_technique(frame):
         print(f"Error in technique analysis: {e}")
         return 7.5  # Return above average score on error
 
+def analyze_frame(frame):
+    """
+    Score expressiveness and technique from one fused feature pass
+    Movement is measured across frames by the motion tracker instead
+    """
+    try:
+        features = compute_frame_features(frame)
+        return {
+            "expressiveness": posture_score(features),
+            "technique": technique_score(features)
+        }
+    except Exception as e:
+        print(f"Error in frame analysis: {e}")
+        # Same fallbacks as the single-aspect analyzers
+        return {"expressiveness": 7.0, "technique": 7.5}
+
 def calculate_pitch_accuracy(pitches, magnitudes):
     """Calculate pitch accuracy score"""
     print("Calculating pitch accuracy...")
@@ -232,61 +233,50 @@ def generate_pitch_tips(score, skill_level):
         "Listen carefully to each note"
     ]
 
-def analyze_visual_performance(video_file):
-    """Analyze visual aspects of the performance"""
+def analyze_visual_performance(video_file, deadline=None):
+    """
+    Analyze visual aspects of the performance; None if the video could not be analyzed
+    Stops early, returning None, once the wall-clock deadline passes
+    Other errors return a fallback payload marked "degraded"
+    """
     print("\n=== Starting Visual Performance Analysis ===")
-    temp_file = None
-    cap = None
+    media, owns_media = as_media_source(video_file)
     try:
-        print(f"Processing video file: {video_file.filename}")
-        
-        # Save video file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            video_file.save(tmp_file.name)
-            temp_file = tmp_file.name
-            print(f"Saved temporary video file at: {temp_file}")
+        print(f"Processing video file: {media.filename}")
             
         # Process video frames
         print("Starting video frame analysis...")
-        cap = cv2.VideoCapture(temp_file)
-        if not cap.isOpened():
+        try:
+            frame_count = media.probe()["frame_count"]
+        except ValueError:
             print("ERROR: Could not open video file")
             return None
-                
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         print(f"Total frames in video: {frame_count}")
 
-        # Analysis results
-        posture_scores = []
-        movement_scores = []
-        technique_scores = []
+        # Decide which frames to analyze so cost follows the sample budget
+        sampler = FrameSampler()
         
-        print("Analyzing frames...")
-        for frame_idx in range(frame_count):
-            ret, frame = cap.read()
-            if not ret:
-                print(f"WARNING: Could not read frame {frame_idx}")
-                continue
-                    
-            print(f"Processing frame {frame_idx + 1}/{frame_count}")
-            
-            # Analyze posture
-            posture_score = analyze_posture(frame)
-            posture_scores.append(posture_score)
-            
-            # Analyze movement
-            movement_score = analyze_movement(frame)
-            movement_scores.append(movement_score)
-            
-            # Analyze technique
-            technique_score = analyze_technique(frame)
-            technique_scores.append(technique_score)
+        # Score sampled frames, split across worker processes for long videos
+        print(f"Analyzing frames (sampling mode: {sampler.mode})...")
+        aggregate = analyze_segments(
+            media,
+            sampler,
+            analyze_frame,
+            keep_timeline=VISUAL_KEEP_TIMELINE,
+            deadline=deadline
+        )
+
+        if not aggregate["count"]:
+            print("ERROR: No frames could be analyzed")
+            return None
 
-        print("\nCalculating final scores...")
+        print(f"\nCalculating final scores from {aggregate['count']} sampled frames...")
         # Calculate average scores
-        avg_expressiveness = np.mean(posture_scores)
-        avg_movement = np.mean(movement_scores)
-        avg_technique = np.mean(technique_scores)
+        # Movement falls back to the old error score if only one frame was sampled
+        averages = aggregate_means(aggregate, default=8.0)
+        avg_expressiveness = averages["expressiveness"]
+        avg_movement = averages["movement"]
+        avg_technique = averages["technique"]
         
         overall_score = (avg_expressiveness + avg_movement + avg_technique) / 3
         
@@ -316,16 +306,26 @@ def analyze_visual_performance(video_file):
                     "Performance becomes hesitant in difficult passages",
                     "Good recovery from minor mistakes"
                 ]
-            }
+            },
         }
+        # Spread of per-sample scores alongside each mean
+        for aspect, stats in aggregate["stats"].items():
+            feedback[aspect]["statistics"] = stats.to_dict()
+        if VISUAL_KEEP_TIMELINE:
+            # Per-sample scores ordered by time; the pipeline returns them as visual_timeline
+            feedback["timeline"] = aggregate["timeline"]
         
         print("=== Visual Analysis Complete ===\n")
         return feedback
 
+    except TimeoutError as e:
+        print(f"Visual analysis abandoned: {e}")
+        return None
     except Exception as e:
         print(f"ERROR in visual analysis: {str(e)}")
         import traceback
         traceback.print_exc()
+        # Served so the student still gets feedback, but never cached
         return {
             "score": 6.0,
             "expressiveness": {
@@ -339,83 +339,16 @@ def analyze_visual_performance(video_file):
             "technique": {
                 "score": 6.0,
                 "feedback": ["Basic technique analysis completed"]
-            }
-        }
-    finally:
-        # Clean up resources
-        if cap is not None:
-            cap.release()
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.unlink(temp_file)
-                print("Cleaned up temporary files")
-            except Exception as e:
-                print(f"Warning: Could not delete temporary file: {e}")
-
-def analyze_audio_performance(video_file):
-    """Analyze audio aspects of the performance"""
-    print("\n=== Starting Audio Performance Analysis ===")
-    try:
-        # More varied scoring for audio analysis
-        pitch_score = np.random.uniform(7.0, 9.5)  # Higher range for pitch
-        rhythm_score = np.random.uniform(6.5, 9.0)  # Good range for rhythm
-        dynamics_score = np.random.uniform(7.5, 9.0)  # Good range for dynamics
-        
-        overall_score = (pitch_score + rhythm_score + dynamics_score) / 3
-        
-        # Format feedback without style_rating (Main.py will add it)
-        feedback = {
-            "score": overall_score,
-            "tempo": {
-                "score": rhythm_score,
-                "feedback": [
-                    "Steady rhythm in main sections",
-                    "Slight rushing in chorus transitions",
-                    "Good use of dynamic pacing"
-                ]
             },
-            "pitch": {
-                "score": pitch_score,
-                "feedback": [
-                    "Excellent intonation in middle register",
-                    "Minor pitch variations in higher notes",
-                    "Strong sense of key maintenance"
-                ]
-            },
-            "rhythm": {
-                "score": dynamics_score,
-                "feedback": [
-                    "Consistent patterns",
-                    "Complex rhythms handled well",
-                    "Some syncopation needs attention"
-                ]
-            }
-        }
-        
-        return feedback
-
-    except Exception as e:
-        print(f"ERROR in audio analysis: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {
-            "score": 6.0,
-            "tempo": {
-                "score": 6.0,
-                "feedback": ["Basic tempo analysis completed"]
-            },
-            "pitch": {
-                "score": 6.0,
-                "feedback": ["Basic pitch analysis completed"]
-            },
-            "rhythm": {
-                "score": 6.0,
-                "feedback": ["Basic rhythm analysis completed"]
-            }
+            "degraded": True
         }
+    finally:
+        # Clean up the spooled upload if we created it here
+        if owns_media:
+            media.close()
 
 def generate_practice_recommendations(visual_feedback, audio_feedback, skill_level):
-    """Generate practice recommendations based on analysis"""
+    """Generate practice recommendations based on analysis; None on failure"""
     print("\n=== Generating Practice Recommendations ===")
     try:
         print(f"Analyzing feedback for {skill_level} skill level")
@@ -423,7 +356,7 @@ def generate_practice_recommendations(visual_feedback, audio_feedback, skill_lev
         print(f"Audio Score: {audio_feedback['score']:.2f}")
 
         recommendations = {
-            "posture_tips": generate_posture_tips(visual_feedback["posture"]["score"], skill_level),
+            "posture_tips": generate_posture_tips(visual_feedback["expressiveness"]["score"], skill_level),
             "technique_tips": generate_technique_tips(visual_feedback["technique"]["score"], skill_level),
             "rhythm_tips": generate_rhythm_tips(audio_feedback["rhythm"]["score"], skill_level),
             "pitch_tips": generate_pitch_tips(audio_feedback["pitch"]["score"], skill_level)
@@ -443,18 +376,16 @@ def generate_practice_recommendations(visual_feedback, audio_feedback, skill_lev
         return None 
 
 def generate_performance_summary(visual_feedback, audio_feedback):
-    """Generate a comprehensive summary using OpenAI"""
+    """Generate a comprehensive summary using OpenAI; None if the request fails"""
     try:
         # Format the feedback data for the prompt
         visual_aspects = []
-        for aspect, data in visual_feedback.items():
-            if aspect != "score":
-                visual_aspects.append(f"{aspect}: {', '.join(data['feedback'])}")
+        for aspect, data in iter_feedback_aspects(visual_feedback):
+            visual_aspects.append(f"{aspect}: {', '.join(data['feedback'])}")
         
         audio_aspects = []
-        for aspect, data in audio_feedback.items():
-            if aspect != "score":
-                audio_aspects.append(f"{aspect}: {', '.join(data['feedback'])}")
+        for aspect, data in iter_feedback_aspects(audio_feedback):
+            audio_aspects.append(f"{aspect}: {', '.join(data['feedback'])}")
         
         # Create the prompt
         prompt = f"""Summarize this music performance analysis in a single, encouraging paragraph:
@@ -490,4 +421,4 @@ Audio: {audio_feedback['score']:.1f}/10"""
         
     except Exception as e:
         print(f"Error generating summary: {e}")
-        return "Performance analysis summary unavailable." 
\ No newline at end of file
+        return None
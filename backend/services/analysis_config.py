@@ -0,0 +1,141 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables at the start
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+
+# Background job settings for /api/analyze-performance/jobs. Jobs run in the web
+# process that accepted them: ANALYSIS_WORKERS at a time, ANALYSIS_QUEUE_MAX more
+# waiting (503 beyond that), per WSGI worker process. Job records live in
+# JOB_STORE_DIR, which every worker process serving the API must share
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '2'))
+ANALYSIS_QUEUE_MAX = int(os.getenv('ANALYSIS_QUEUE_MAX', '8'))
+JOB_RESULT_TTL = int(os.getenv('ANALYSIS_JOB_TTL', '3600'))  # Seconds a finished job is kept
+JOB_STORE_DIR = os.getenv(
+    'JOB_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'jobs')
+)
+
+# How the visual and audio branches run inside one analysis: serial, thread or process.
+# Each branch stops at its timeout in every mode; in serial mode the timeout counts
+# from when that branch starts
+ANALYSIS_EXECUTION_MODE = os.getenv('ANALYSIS_EXECUTION_MODE', 'thread').lower()
+VISUAL_BRANCH_TIMEOUT = float(os.getenv('VISUAL_BRANCH_TIMEOUT', '600'))  # Seconds
+AUDIO_BRANCH_TIMEOUT = float(os.getenv('AUDIO_BRANCH_TIMEOUT', '300'))  # Seconds
+
+# Visual frame sampling: all, fps, count or budget (see services/frame_sampler.py)
+VISUAL_SAMPLE_MODE = os.getenv('VISUAL_SAMPLE_MODE', 'count').lower()
+VISUAL_SAMPLE_FPS = float(os.getenv('VISUAL_SAMPLE_FPS', '2'))
+VISUAL_SAMPLE_FRAMES = int(os.getenv('VISUAL_SAMPLE_FRAMES', '120'))
+VISUAL_TIME_BUDGET = float(os.getenv('VISUAL_TIME_BUDGET', '20'))  # Seconds
+
+# Segment-parallel visual analysis: worker processes each score a slice of the sampled frames
+VISUAL_SEGMENT_WORKERS = int(os.getenv('VISUAL_SEGMENT_WORKERS', str(os.cpu_count() or 1)))
+VISUAL_MIN_SEGMENT_FRAMES = int(os.getenv('VISUAL_MIN_SEGMENT_FRAMES', '30'))
+
+# Return the per-sample timeline as visual_timeline. Off by default: the timeline
+# holds one record per sample, while the streaming statistics stay constant-size
+VISUAL_KEEP_TIMELINE = os.getenv('VISUAL_KEEP_TIMELINE', 'false').lower() == 'true'
+
+# Decode-ahead pipeline: frames buffered ahead of scoring, and scorer threads per decoder
+FRAME_PREFETCH_DEPTH = int(os.getenv('FRAME_PREFETCH_DEPTH', '8'))
+FRAME_SCORING_THREADS = int(os.getenv('FRAME_SCORING_THREADS', '2'))
+
+# Near-duplicate frame skipping: frames within this many dHash bits (of 256) of the
+# last scored frame reuse its scores; negative disables skipping. The motion thumbnail
+# must agree: at most FRAME_DEDUP_MAX_CHANGED of its pixels may differ by more than
+# FRAME_DEDUP_PIXEL_DELTA (0-255)
+FRAME_DEDUP_THRESHOLD = int(os.getenv('FRAME_DEDUP_THRESHOLD', '6'))
+FRAME_DEDUP_PIXEL_DELTA = int(os.getenv('FRAME_DEDUP_PIXEL_DELTA', '12'))
+FRAME_DEDUP_MAX_CHANGED = float(os.getenv('FRAME_DEDUP_MAX_CHANGED', '0.001'))
+
+# ffmpeg executable used to decode audio tracks straight to PCM
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+
+# Recordings longer than this (seconds) are analyzed block by block from the decoder
+# instead of being decoded whole; blocks are AUDIO_STREAM_BLOCK_SECONDS long
+AUDIO_STREAM_MIN_SECONDS = float(os.getenv('AUDIO_STREAM_MIN_SECONDS', '600'))
+AUDIO_STREAM_BLOCK_SECONDS = float(os.getenv('AUDIO_STREAM_BLOCK_SECONDS', '30'))
+
+# Target sample rates (Hz) per audio task; lower rates shrink every FFT in that task
+AUDIO_SAMPLE_RATES = {
+    'analysis': int(os.getenv('AUDIO_ANALYSIS_SR', '22050')),
+    'beat': int(os.getenv('AUDIO_BEAT_SR', '11025')),
+    'model': int(os.getenv('AUDIO_MODEL_SR', '16000')),
+    'transcription': int(os.getenv('AUDIO_TRANSCRIPTION_SR', '22050')),
+    'activity': int(os.getenv('AUDIO_ACTIVITY_SR', '8000'))
+}
+
+# Resampler: "ffmpeg" resamples while decoding; otherwise a librosa res_type
+# such as soxr_qq (fast) or soxr_hq (librosa's default)
+AUDIO_RESAMPLER = os.getenv('AUDIO_RESAMPLER', 'ffmpeg')
+
+# Performance activity detection: trim silence, talking and set-up time from both
+# branches. Frames count as active within ACTIVITY_ENERGY_DB of the loud passages and
+# below ACTIVITY_MAX_FLATNESS (0 tonal, 1 noise); gaps and runs are in seconds
+ACTIVITY_TRIM_ENABLED = os.getenv('ACTIVITY_TRIM_ENABLED', 'true').lower() == 'true'
+ACTIVITY_ENERGY_DB = float(os.getenv('ACTIVITY_ENERGY_DB', '30'))
+ACTIVITY_MAX_FLATNESS = float(os.getenv('ACTIVITY_MAX_FLATNESS', '0.3'))
+ACTIVITY_MIN_GAP = float(os.getenv('ACTIVITY_MIN_GAP', '1.5'))
+ACTIVITY_MIN_RUN = float(os.getenv('ACTIVITY_MIN_RUN', '2.0'))
+ACTIVITY_PADDING = float(os.getenv('ACTIVITY_PADDING', '0.5'))
+
+# In-memory cache of decoded audio per (file, sample rate)
+AUDIO_CACHE_MAX_BYTES = int(float(os.getenv('AUDIO_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+# Longest side in pixels that frames are downscaled to before scoring (0 keeps full resolution)
+ANALYSIS_MAX_SIDE = int(os.getenv('ANALYSIS_MAX_SIDE', '720'))
+
+# Bump when scoring logic changes so cached results from older analyzers are not served
+ANALYZER_VERSION = '6'
+
+# Content-addressed cache of finished analyses
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_DIR = os.getenv(
+    'RESULT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'analysis')
+)
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv('RESULT_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+def analysis_params():
+    """Settings that change analysis output; part of every result cache key"""
+    return {
+        'skill_level': 'intermediate',
+        'analysis_max_side': ANALYSIS_MAX_SIDE,
+        'frame_dedup': {
+            'threshold': FRAME_DEDUP_THRESHOLD,
+            'pixel_delta': FRAME_DEDUP_PIXEL_DELTA,
+            'max_changed': FRAME_DEDUP_MAX_CHANGED
+        },
+        'visual_keep_timeline': VISUAL_KEEP_TIMELINE,
+        'visual_segments': {
+            'workers': VISUAL_SEGMENT_WORKERS,
+            'min_frames': VISUAL_MIN_SEGMENT_FRAMES
+        },
+        'audio_stream_min_seconds': AUDIO_STREAM_MIN_SECONDS,
+        'audio_stream_block_seconds': AUDIO_STREAM_BLOCK_SECONDS,
+        'audio_sample_rates': AUDIO_SAMPLE_RATES,
+        'audio_resampler': AUDIO_RESAMPLER,
+        'activity_trim': {
+            'enabled': ACTIVITY_TRIM_ENABLED,
+            'energy_db': ACTIVITY_ENERGY_DB,
+            'max_flatness': ACTIVITY_MAX_FLATNESS,
+            'min_gap': ACTIVITY_MIN_GAP,
+            'min_run': ACTIVITY_MIN_RUN,
+            'padding': ACTIVITY_PADDING
+        },
+        'visual_sampling': {
+            'mode': VISUAL_SAMPLE_MODE,
+            'target_fps': VISUAL_SAMPLE_FPS,
+            'max_frames': VISUAL_SAMPLE_FRAMES,
+            'time_budget': VISUAL_TIME_BUDGET
+        }
+    }
+
+# Persistent cache of vision-model frame scores keyed by perceptual hash
+VLM_CACHE_PATH = os.getenv(
+    'VLM_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'vlm_scores.json')
+)
+VLM_CACHE_MAX_ENTRIES = int(os.getenv('VLM_CACHE_MAX_ENTRIES', '20000'))
+VLM_CACHE_MAX_DISTANCE = int(os.getenv('VLM_CACHE_MAX_DISTANCE', '8'))  # Bits of a 256-bit dHash
@@ -0,0 +1,86 @@
+import subprocess
+import numpy as np
+
+from .analysis_config import FFMPEG_BINARY
+
+
+class NoAudioStream(ValueError):
+    """The media file has no audio track to decode"""
+
+
+def ffmpeg_pcm_command(path, sr, start=None, duration=None):
+    """
+    ffmpeg arguments that write the first audio stream to stdout as mono float32 at sr
+    start/duration (seconds) restrict decoding to part of the file
+    """
+    window = []
+    if start:
+        window += ['-ss', f'{start:.3f}']
+    if duration is not None:
+        window += ['-t', f'{duration:.3f}']
+    return [
+        FFMPEG_BINARY,
+        '-nostdin',
+        '-v', 'error',
+        *window,
+        '-i', path,
+        '-map', '0:a:0',
+        '-vn',
+        '-ac', '1',
+        '-ar', str(sr),
+        '-f', 'f32le',
+        'pipe:1'
+    ]
+
+
+def decode_pcm(path, sr=22050):
+    """
+    Decode the audio track of a media file straight to a mono float32 array at sr
+    ffmpeg downmixes and resamples in one pass; nothing is written to disk
+    The array is read-only since it shares memory with the pipe buffer
+    """
+    result = subprocess.run(
+        ffmpeg_pcm_command(path, sr),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise _decode_error(path, result.stderr)
+    return np.frombuffer(result.stdout, dtype='<f4')
+
+
+def stream_pcm(path, sr=22050, block_size=1 << 19, start=None, duration=None):
+    """
+    Yield mono float32 blocks of up to block_size samples at sr as ffmpeg decodes them
+    Only one block is held at a time, so memory does not grow with the recording length
+    """
+    process = subprocess.Popen(
+        ffmpeg_pcm_command(path, sr, start, duration),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(block_size * 4)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype='<f4', count=len(data) // 4)
+        finished = True
+    finally:
+        if not finished:
+            process.kill()
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise _decode_error(path, stderr)
+
+
+def _decode_error(path, stderr):
+    """NoAudioStream when -map 0:a:0 found nothing, otherwise ValueError with ffmpeg's last line"""
+    error = stderr.decode('utf-8', 'replace').strip().splitlines()
+    if any('matches no streams' in line for line in error):
+        return NoAudioStream(f"{path} has no audio track")
+    return ValueError(f"Could not decode audio from {path}: {error[-1] if error else 'ffmpeg failed'}")
@@ -0,0 +1,65 @@
+from functools import cached_property
+import numpy as np
+import librosa
+
+from .pitch_contour import pitch_contour
+
+
+class AudioFeatures:
+    """
+    Spectral features of one decoded signal, each computed on first use and reused
+    Every feature derives from a single STFT, so analyzers that share an instance
+    share the FFT work instead of each running their own
+    """
+
+    def __init__(self, y, sr, n_fft=2048, hop_length=512):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    @cached_property
+    def stft_magnitude(self):
+        return np.abs(librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length))
+
+    @cached_property
+    def power_spectrogram(self):
+        return self.stft_magnitude ** 2
+
+    @cached_property
+    def onset_envelope(self):
+        # Same log-mel flux librosa computes from y, minus the extra STFT
+        mel = librosa.feature.melspectrogram(S=self.power_spectrogram, sr=self.sr)
+        return librosa.onset.onset_strength(S=librosa.power_to_db(mel), sr=self.sr, hop_length=self.hop_length)
+
+    @cached_property
+    def rms(self):
+        return librosa.feature.rms(S=self.stft_magnitude, frame_length=self.n_fft, hop_length=self.hop_length)[0]
+
+    @cached_property
+    def chroma(self):
+        return librosa.feature.chroma_stft(S=self.power_spectrogram, sr=self.sr, n_fft=self.n_fft, hop_length=self.hop_length)
+
+    @cached_property
+    def beats(self):
+        """(tempo_bpm, beat_frames) tracked on the shared onset envelope"""
+        tempo, beat_frames = librosa.beat.beat_track(
+            onset_envelope=self.onset_envelope,
+            sr=self.sr,
+            hop_length=self.hop_length
+        )
+        return float(np.atleast_1d(tempo)[0]), beat_frames
+
+    @cached_property
+    def beat_times(self):
+        return librosa.frames_to_time(self.beats[1], sr=self.sr, hop_length=self.hop_length)
+
+    @cached_property
+    def pitch_contour(self):
+        """YIN f0 per STFT frame with voiced mask and cents deviation"""
+        return pitch_contour(self.y, self.sr, frame_length=self.n_fft, hop_length=self.hop_length)
+
+    @cached_property
+    def chroma_correlation(self):
+        """12 x 12 correlation of chroma bins over time"""
+        return np.corrcoef(self.chroma)
@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+import librosa
+
+from .analysis_config import AUDIO_SAMPLE_RATES, AUDIO_RESAMPLER, AUDIO_CACHE_MAX_BYTES
+from .audio_decode import decode_pcm
+
+
+def task_sample_rate(task):
+    """Configured target rate (Hz) for an analysis task such as 'beat' or 'model'"""
+    return AUDIO_SAMPLE_RATES.get(task, AUDIO_SAMPLE_RATES['analysis'])
+
+
+def decode_audio(path, sr, resampler=AUDIO_RESAMPLER):
+    """
+    Decode a file to a mono float32 array at sr
+    "ffmpeg" resamples inside the decoder pipe; any other value is a librosa
+    res_type (soxr_qq, soxr_hq, kaiser_fast, ...) used by librosa.load
+    """
+    if resampler == 'ffmpeg':
+        return decode_pcm(path, sr)
+    y, _ = librosa.load(path, sr=sr, mono=True, res_type=resampler)
+    return y
+
+
+def resample(y, orig_sr, target_sr, resampler=AUDIO_RESAMPLER):
+    """Resample an already decoded array; the ffmpeg setting falls back to fast soxr"""
+    if orig_sr == target_sr:
+        return y
+    res_type = 'soxr_qq' if resampler == 'ffmpeg' else resampler
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr, res_type=res_type)
+
+
+class AudioLoader:
+    """
+    Central audio loading for every analyzer and generator
+    Decoded arrays are kept in memory per (file, sample rate) and evicted least
+    recently used once they add up to more than max_bytes; an entry is stale as
+    soon as the file's size or mtime changes
+    """
+
+    def __init__(self, max_bytes=AUDIO_CACHE_MAX_BYTES, resampler=AUDIO_RESAMPLER):
+        self.max_bytes = max_bytes
+        self.resampler = resampler
+        self._entries = OrderedDict()  # (path, size, mtime, sr) -> samples, most recent last
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def load(self, path, task='analysis', sr=None, cache=True):
+        """Return (y, sr) for a file at the task's rate, or at sr if given"""
+        sr = sr or task_sample_rate(task)
+        if not cache:
+            return decode_audio(path, sr, self.resampler), sr
+
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sr)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key], sr
+
+        y = decode_audio(path, sr, self.resampler)
+        # Cached arrays are shared between callers
+        y.flags.writeable = False
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = y
+                self._bytes += y.nbytes
+                self._evict()
+        return y, sr
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+audio_loader = AudioLoader()
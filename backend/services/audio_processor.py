@@ -1,11 +1,15 @@
-from pydub import AudioSegment
-import librosa
 import numpy as np
-import tempfile
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
-import shutil
+from .media_ingest import as_media_source
+from .audio_features import AudioFeatures
+from .audio_stream import StreamingAudioFeatures
+from .audio_loader import task_sample_rate
+from .audio_decode import NoAudioStream
+from .analysis_config import AUDIO_STREAM_MIN_SECONDS
+from .deadlines import check_deadline
+from utils.formatters import format_audio_feedback
 
 # Load environment variables at the start
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
@@ -17,43 +21,61 @@ if not api_key:
     
 client = OpenAI(api_key=api_key)
 
-def extract_audio(video_file):
+def extract_audio(media, sr=None):
     """
-    Extracts audio from video file and returns WAV path
-    Ensures proper cleanup of temporary files
+    Returns the decoded mono PCM of a MediaSource as (y, sr), at the
+    configured analysis rate unless sr is given
+    The upload is spooled and decoded once and shared with the visual branch
     """
-    temp_dir = tempfile.mkdtemp()  # Create temporary directory
-    try:
-        # Save video to temp file
-        video_path = os.path.join(temp_dir, 'temp_video.mp4')
-        with open(video_path, 'wb') as f:
-            f.write(video_file.read())
-        
-        # Extract audio using pydub
-        audio = AudioSegment.from_file(video_path)
-        wav_path = os.path.join(temp_dir, 'temp_audio.wav')
-        audio.export(wav_path, format="wav")
-        
-        return wav_path, temp_dir
-        
-    except Exception as e:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise e
+    return media.audio_pcm(sr or task_sample_rate('analysis'))
 
-def analyze_audio_performance(video_file):
+def load_audio_features(media, sr=None):
+    """
+    Returns (y, features) for a MediaSource
+    Long recordings are streamed block by block and y is None; shorter ones
+    are decoded whole and share the decoded PCM
+    Only the detected performance span is analyzed when one is set
     """
-    Complete audio analysis pipeline with proper cleanup
+    if media.has_audio is False:
+        raise NoAudioStream(f"{media.filename} has no audio track")
+    start = None
+    if media.span is not None:
+        start, end = media.span
+        duration = end - start
+    else:
+        try:
+            duration = media.probe()["duration"]
+        except ValueError:
+            duration = 0.0
+    if duration > AUDIO_STREAM_MIN_SECONDS:
+        print(f"Streaming audio analysis for {duration:.0f}s recording")
+        return None, StreamingAudioFeatures.from_path(
+            media.path,
+            sr or task_sample_rate('analysis'),
+            start=start,
+            duration=duration if start is not None else None
+        )
+    y, sr = extract_audio(media, sr)
+    return y, AudioFeatures(y, sr)
+
+def analyze_audio_performance(media, deadline=None):
     """
-    temp_dir = None
+    Complete audio analysis pipeline on the shared media source
+    Returns None if the wall-clock deadline passes before the GPT call, and a
+    fallback payload marked "degraded" if any step fails
+    A video without an audio track gets the same payload unmarked, as a final result
+    """
+    media, owns_media = as_media_source(media)
     try:
-        # Reset file pointer to beginning
-        video_file.seek(0)
-        
-        # Extract audio - now properly unpacking both return values
-        wav_path, temp_dir = extract_audio(video_file)
+        # Decode audio from the already spooled upload
+        y, features = load_audio_features(media)
         
         # Get technical analysis
-        tech_analysis = analyze_technical_aspects(wav_path)
+        tech_analysis = analyze_technical_aspects(y, features.sr, features)
+        degraded = tech_analysis.pop("degraded", False)
+        
+        # Don't spend a GPT request on an analysis nobody is waiting for
+        check_deadline(deadline, "Audio analysis")
         
         # Get musical analysis from GPT
         analysis = client.chat.completions.create(
@@ -82,55 +104,68 @@ def analyze_audio_performance(video_file):
         )
         
         result = format_audio_feedback(analysis.choices[0].message.content, tech_analysis)
+        if result is not None and degraded:
+            result["degraded"] = True
         
         return result
         
+    except TimeoutError as e:
+        print(f"Audio analysis abandoned: {e}")
+        return None
+    except NoAudioStream as e:
+        print(f"No audio to analyze: {e}")
+        return _default_audio_feedback("No audio track found in the video")
     except Exception as e:
         print(f"Error in audio analysis: {e}")
-        # Return a default response instead of None
-        return {
+        # Return a default response instead of None; served but never cached
+        return {**_default_audio_feedback(), "degraded": True}
+    finally:
+        # Clean up the spooled upload if we created it here
+        if owns_media:
+            media.close()
+
+def _default_audio_feedback(note=None):
+    """Neutral scores for when the recording could not be measured"""
+    return {
+        "score": 6.0,
+        "tempo": {
             "score": 6.0,
-            "tempo": {
-                "score": 6.0,
-                "feedback": "Basic tempo analysis completed"
-            },
-            "pitch": {
-                "score": 6.0,
-                "feedback": "Basic pitch analysis completed"
-            },
-            "rhythm": {
-                "score": 6.0,
-                "feedback": "Basic rhythm analysis completed"
-            },
-            "technical_data": {
-                "tempo": {"bpm": 120.0, "consistency": 0.6},
-                "pitch": {"accuracy": 0.6, "stability": 0.6},
-                "rhythm": {"regularity": 0.6, "onset_strength": 0.6}
-            }
+            "feedback": [note or "Basic tempo analysis completed"]
+        },
+        "pitch": {
+            "score": 6.0,
+            "feedback": [note or "Basic pitch analysis completed"]
+        },
+        "rhythm": {
+            "score": 6.0,
+            "feedback": [note or "Basic rhythm analysis completed"]
+        },
+        "technical_data": {
+            "tempo": {"bpm": 120.0, "consistency": 0.6},
+            "pitch": {"accuracy": 0.6, "stability": 0.6},
+            "rhythm": {"regularity": 0.6, "onset_strength": 0.6}
         }
-    finally:
-        # Clean up temporary files
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir, ignore_errors=True)
+    }
 
-def analyze_technical_aspects(wav_path):
+def analyze_technical_aspects(y, sr, features=None):
     """
-    Detailed technical analysis using librosa
+    Detailed technical analysis using librosa on a decoded signal
+    Pass an AudioFeatures to reuse spectral features computed by another analyzer,
+    or a StreamingAudioFeatures (with y None) for block-wise analysis
+    On error returns default measurements marked "degraded"
     """
     try:
-        y, sr = librosa.load(wav_path)
+        features = features or AudioFeatures(y, sr)
         
         # Tempo and beat analysis
-        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-        beat_times = librosa.frames_to_time(beat_frames, sr=sr)
-        tempo_consistency = calculate_tempo_consistency(beat_times)
+        tempo, _ = features.beats
+        tempo_consistency = calculate_tempo_consistency(features.beat_times)
         
         # Pitch analysis
-        pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-        pitch_stats = analyze_pitch_accuracy(pitches[magnitudes > 0])
+        pitch_stats = analyze_pitch_accuracy(features.pitch_contour)
         
         # Rhythm analysis
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_env = features.onset_envelope
         rhythm_regularity = calculate_rhythm_regularity(onset_env)
         
         return {
@@ -144,12 +179,15 @@ def analyze_technical_aspects(wav_path):
                 "onset_strength": float(np.mean(onset_env))
             }
         }
+    except NoAudioStream:
+        raise
     except Exception as e:
         print(f"Error in technical analysis: {e}")
         return {
             "tempo": {"bpm": 120.0, "consistency": 0.6},
             "pitch": {"accuracy": 0.6, "stability": 0.6},
-            "rhythm": {"regularity": 0.6, "onset_strength": 0.6}
+            "rhythm": {"regularity": 0.6, "onset_strength": 0.6},
+            "degraded": True
         }
 
 def calculate_tempo_consistency(beat_times):
@@ -160,17 +198,18 @@ def calculate_tempo_consistency(beat_times):
     intervals = np.diff(beat_times)
     return 1.0 - np.std(intervals) / np.mean(intervals)
 
-def analyze_pitch_accuracy(pitches):
-    """Analyze pitch accuracy and stability"""
+def analyze_pitch_accuracy(contour):
+    """Analyze intonation from an f0 contour: accuracy and stability against the semitone grid"""
+    pitches = contour.voiced_f0
     if len(pitches) == 0:
         return {"accuracy": 0.0, "stability": 0.0}
     
-    mean_pitch = np.mean(pitches)
-    pitch_std = np.std(pitches)
-    
     return {
-        "mean": float(mean_pitch),
-        "stability": float(1.0 - pitch_std / mean_pitch),
+        "mean": float(np.mean(pitches)),
+        "accuracy": contour.intonation_accuracy,
+        "stability": contour.intonation_stability,
+        "cents_deviation": contour.mean_abs_cents,
+        "voiced_ratio": contour.voiced_ratio,
         "range": {
             "min": float(np.min(pitches)),
             "max": float(np.max(pitches))
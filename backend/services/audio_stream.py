@@ -0,0 +1,132 @@
+from functools import cached_property
+import numpy as np
+import librosa
+
+from .analysis_config import AUDIO_STREAM_BLOCK_SECONDS
+from .audio_decode import stream_pcm
+from .pitch_contour import PitchContour, pitch_contour
+from .streaming_stats import MetricTimeline
+
+
+class StreamingAudioFeatures:
+    """
+    Reduced per-frame audio features computed block by block from a PCM stream
+    Spectra exist for one block at a time; per frame only onset strength, RMS and
+    the YIN f0 are kept, plus running chroma moments, so memory stays
+    flat for hour-long recordings
+    Exposes the same feature names as AudioFeatures for the analyzers that use them
+    """
+
+    def __init__(self, sr, n_fft=2048, hop_length=512, excerpt_seconds=30):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.samples = 0
+        self.frames = MetricTimeline(("onset", "rms", "pitch"), capacity=4096)
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        # Samples that did not fill a whole frame yet, carried into the next block
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._previous_mel = None
+        self._chroma_sum = np.zeros(12)
+        self._chroma_outer = np.zeros((12, 12))
+        self._chroma_frames = 0
+        # The opening seconds are kept for models that need raw audio
+        self._excerpt_samples = int(excerpt_seconds * sr)
+        self._excerpt = []
+
+    @classmethod
+    def from_path(cls, path, sr=22050, block_seconds=AUDIO_STREAM_BLOCK_SECONDS,
+                  start=None, duration=None, **kwargs):
+        """
+        Decode a media file through an ffmpeg pipe and fold it in block by block
+        start/duration (seconds) limit the analysis to part of the file
+        """
+        features = cls(sr, **kwargs)
+        blocks = stream_pcm(path, sr, block_size=int(block_seconds * sr), start=start, duration=duration)
+        for block in blocks:
+            features.add_block(block)
+        return features
+
+    def add_block(self, block):
+        kept = sum(len(part) for part in self._excerpt)
+        if kept < self._excerpt_samples:
+            self._excerpt.append(block[:self._excerpt_samples - kept].copy())
+        self.samples += len(block)
+
+        signal = np.concatenate([self._carry, block])
+        if len(signal) < self.n_fft:
+            self._carry = signal
+            return
+        n_frames = 1 + (len(signal) - self.n_fft) // self.hop_length
+        used = (n_frames - 1) * self.hop_length + self.n_fft
+        # Frames overlap, so the tail after the last hop is analyzed again with the next block
+        self._carry = signal[n_frames * self.hop_length:]
+
+        magnitude = np.abs(librosa.stft(
+            signal[:used], n_fft=self.n_fft, hop_length=self.hop_length, center=False
+        ))
+        power = magnitude ** 2
+
+        # Onset strength: mean positive log-mel flux, continued across the block boundary
+        log_mel = librosa.power_to_db(self._mel_basis @ power, top_db=None)
+        previous = self._previous_mel if self._previous_mel is not None else log_mel[:, :1]
+        flux = np.diff(np.concatenate([previous, log_mel], axis=1), axis=1)
+        onset = np.maximum(flux, 0.0).mean(axis=0)
+        self._previous_mel = log_mel[:, -1:]
+
+        rms = librosa.feature.rms(S=magnitude, frame_length=self.n_fft, hop_length=self.hop_length)[0]
+        pitch = pitch_contour(
+            signal[:used], self.sr, frame_length=self.n_fft, hop_length=self.hop_length, center=False
+        ).f0
+
+        # Fixed tuning so every block maps to the same chroma bins
+        chroma = librosa.feature.chroma_stft(S=power, sr=self.sr, n_fft=self.n_fft, tuning=0.0)
+        self._chroma_sum += chroma.sum(axis=1)
+        self._chroma_outer += chroma @ chroma.T
+        self._chroma_frames += chroma.shape[1]
+
+        self.frames.extend(np.column_stack([onset, rms, pitch]))
+
+    @property
+    def duration(self):
+        return self.samples / self.sr
+
+    @property
+    def excerpt(self):
+        return np.concatenate(self._excerpt) if self._excerpt else np.zeros(0, dtype=np.float32)
+
+    @property
+    def onset_envelope(self):
+        return self.frames.column("onset")
+
+    @property
+    def rms(self):
+        return self.frames.column("rms")
+
+    @cached_property
+    def pitch_contour(self):
+        return PitchContour.from_f0(self.frames.column("pitch"))
+
+    @cached_property
+    def beats(self):
+        """(tempo_bpm, beat_frames) tracked on the accumulated onset envelope"""
+        tempo, beat_frames = librosa.beat.beat_track(
+            onset_envelope=self.onset_envelope,
+            sr=self.sr,
+            hop_length=self.hop_length
+        )
+        return float(np.atleast_1d(tempo)[0]), beat_frames
+
+    @cached_property
+    def beat_times(self):
+        return librosa.frames_to_time(self.beats[1], sr=self.sr, hop_length=self.hop_length)
+
+    @cached_property
+    def chroma_correlation(self):
+        """12 x 12 correlation of chroma bins over time, from running moments"""
+        n = max(self._chroma_frames, 1)
+        mean = self._chroma_sum / n
+        covariance = self._chroma_outer / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return covariance / np.outer(std, std)
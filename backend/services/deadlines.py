@@ -0,0 +1,12 @@
+import time
+
+
+def deadline_after(seconds):
+    """Wall-clock deadline seconds from now; comparable across worker processes"""
+    return time.time() + seconds
+
+
+def check_deadline(deadline, what="Analysis"):
+    """Raise TimeoutError once deadline has passed; a None deadline never expires"""
+    if deadline is not None and time.time() > deadline:
+        raise TimeoutError(f"{what} stopped at its deadline")
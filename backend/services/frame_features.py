@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+from dataclasses import dataclass
+
+from .analysis_config import ANALYSIS_MAX_SIDE
+
+# Edge densities are reported as if measured on a frame with this longest side
+REFERENCE_LONG_SIDE = 720
+
+
+@dataclass
+class FrameFeatures:
+    gray: np.ndarray
+    center_mass: float = 0.0    # Mean intensity of the central third
+    std: float = 0.0            # Intensity standard deviation of the whole frame
+    edge_density: float = 0.0   # Sum of Canny edge values per pixel, at reference resolution
+
+
+def downscale_for_analysis(image, max_side=ANALYSIS_MAX_SIDE):
+    """
+    Shrink an image so its longest side is at most max_side
+    Halves with pyrDown while still at least twice too big, then finishes with an area resize
+    """
+    if not max_side:
+        return image
+
+    height, width = image.shape[:2]
+    while max(height, width) >= 2 * max_side:
+        image = cv2.pyrDown(image)
+        height, width = image.shape[:2]
+
+    long_side = max(height, width)
+    if long_side > max_side:
+        scale = max_side / long_side
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def to_analysis_gray(frame, max_side=ANALYSIS_MAX_SIDE):
+    """Grayscale frame at analysis resolution, shared by every scorer"""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return downscale_for_analysis(frame, max_side)
+
+
+def compute_frame_features(frame, max_side=ANALYSIS_MAX_SIDE):
+    """Compute grayscale, edges, center mass and variance once per frame"""
+    gray = to_analysis_gray(frame, max_side)
+    height, width = gray.shape
+
+    _, std = cv2.meanStdDev(gray)
+    center_mass = cv2.mean(gray[height//3:2*height//3, width//3:2*width//3])[0]
+
+    # Canny output is 0/255, so the edge sum is 255 * non-zero count
+    edges = cv2.Canny(gray, 100, 200)
+    edge_density = cv2.countNonZero(edges) * 255.0 / (height * width)
+
+    # Edges are thin curves, so their pixel share falls as resolution rises;
+    # rescale to the reference size so scores match across input resolutions
+    edge_density *= max(height, width) / REFERENCE_LONG_SIDE
+
+    return FrameFeatures(
+        gray=gray,
+        center_mass=float(center_mass),
+        std=float(std[0][0]),
+        edge_density=float(edge_density)
+    )
+
+
+def posture_score(features):
+    """Expressiveness score from central brightness and overall variance"""
+    variance = features.std * 2  # Add variance for more dynamic scoring
+    return min(10, max(0, (features.center_mass / 25.5) + (variance / 25.5)))
+
+
+def movement_score(features):
+    """Movement score from overall variance and edge density"""
+    return min(10, max(0, (features.std / 20.0) + (features.edge_density * 5)))
+
+
+def technique_score(features):
+    """Technique score from edge density and texture"""
+    texture = features.std / 25.5
+    return min(10, max(0, (features.edge_density * 8) + (texture * 2)))
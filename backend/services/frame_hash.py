@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+from .analysis_config import (
+    FRAME_DEDUP_THRESHOLD,
+    FRAME_DEDUP_PIXEL_DELTA,
+    FRAME_DEDUP_MAX_CHANGED
+)
+from .frame_features import to_analysis_gray
+from .motion_analysis import motion_thumbnail
+
+# Duplicate detection hashes at 16x16 (256 bits); 8x8 cells are too coarse to see a limb move
+DEDUP_HASH_SIZE = 16
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash: compare neighbouring pixels of a (hash_size+1) x hash_size
+    thumbnail, giving a hash_size**2-bit integer that survives noise and compression
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def changed_fraction(a, b, delta=FRAME_DEDUP_PIXEL_DELTA):
+    """Share of pixels that differ by more than delta (0-255) between two same-sized images"""
+    return np.count_nonzero(cv2.absdiff(a, b) > delta) / a.size
+
+
+class DuplicateFilter:
+    """
+    Flags frames that look the same as the last frame that was actually scored
+    A frame is a duplicate only if its dHash is within threshold bits of that anchor
+    and almost none of its motion-thumbnail pixels changed, so a hand or object
+    moving across a static background is always rescored
+    Comparing against that anchor, not the previous frame, means slow drift
+    still triggers a rescore once it adds up
+    """
+
+    def __init__(self, threshold=FRAME_DEDUP_THRESHOLD, max_changed=FRAME_DEDUP_MAX_CHANGED):
+        self.threshold = threshold
+        self.max_changed = max_changed
+        self._anchor = None  # (frame_hash, thumbnail) of the last scored frame
+
+    def is_duplicate(self, image, thumbnail=None):
+        """thumbnail is the frame's motion thumbnail, if the caller already made one"""
+        gray = to_analysis_gray(image)
+        frame_hash = dhash(gray, hash_size=DEDUP_HASH_SIZE)
+        if thumbnail is None:
+            thumbnail = motion_thumbnail(gray)
+
+        if self._anchor is not None:
+            anchor_hash, anchor_thumbnail = self._anchor
+            if (
+                hamming_distance(frame_hash, anchor_hash) <= self.threshold
+                and anchor_thumbnail.shape == thumbnail.shape
+                and changed_fraction(thumbnail, anchor_thumbnail) <= self.max_changed
+            ):
+                return True
+        self._anchor = (frame_hash, thumbnail)
+        return False
@@ -0,0 +1,133 @@
+import queue
+import threading
+import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .analysis_config import FRAME_PREFETCH_DEPTH, FRAME_SCORING_THREADS
+
+_END = object()
+
+
+class _ProducerError:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(items, transform=None, maxsize=FRAME_PREFETCH_DEPTH):
+    """
+    Iterate items on a background decoder thread, at most maxsize ahead of the consumer
+    transform(item), if given, also runs on the decoder thread (e.g. grayscale/downscale)
+    Errors raised while decoding are re-raised in the consumer
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        # Block for space, but give up if the consumer has gone away
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if transform is not None:
+                    item = transform(item)
+                if not put(item):
+                    break
+        except Exception as e:
+            put(_ProducerError(e))
+        finally:
+            # Release the decoder on this thread
+            if hasattr(items, 'close'):
+                items.close()
+            put(_END)
+
+    producer = threading.Thread(target=produce, name='frame-decoder', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+
+def ordered_map(fn, items, workers=FRAME_SCORING_THREADS, max_in_flight=None):
+    """
+    Apply fn to items on a thread pool, yielding results in input order
+    At most max_in_flight items are held at once so memory stays bounded
+    """
+    if workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frame-scorer') as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class BackgroundVideoWriter:
+    """
+    Encodes frames to a video file on its own thread so encoding overlaps analysis
+    write() blocks once maxsize frames are waiting; encoder errors are re-raised there
+    """
+
+    def __init__(self, path, fps, frame_size, fourcc='mp4v', maxsize=FRAME_PREFETCH_DEPTH):
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, frame_size)
+        if not self._writer.isOpened():
+            raise ValueError(f"Could not open video writer for {path}")
+        self._buffer = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._encoder = threading.Thread(target=self._encode, name='frame-encoder', daemon=True)
+        self._encoder.start()
+
+    def _encode(self):
+        try:
+            while True:
+                frame = self._buffer.get()
+                if frame is _END:
+                    break
+                if self._error is None:
+                    try:
+                        self._writer.write(frame)
+                    except Exception as e:
+                        self._error = e
+        finally:
+            self._writer.release()
+
+    def write(self, frame):
+        if self._error is not None:
+            raise self._error
+        self._buffer.put(frame)
+
+    def close(self):
+        """Flush queued frames and finish the file"""
+        if self._encoder.is_alive():
+            self._buffer.put(_END)
+            self._encoder.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
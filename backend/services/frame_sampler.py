@@ -0,0 +1,124 @@
+import time
+import cv2
+import numpy as np
+
+from .analysis_config import (
+    VISUAL_SAMPLE_MODE,
+    VISUAL_SAMPLE_FPS,
+    VISUAL_SAMPLE_FRAMES,
+    VISUAL_TIME_BUDGET
+)
+
+
+class FrameSampler:
+    """
+    Chooses which frames of a video to analyze and decodes only those
+    Modes:
+        all    - every frame
+        fps    - about target_fps frames per second of video
+        count  - max_frames evenly spaced frames
+        budget - evenly spaced frames visited coarse-to-fine until time_budget seconds pass
+    Skipped frames are grab()bed without decoding, or seeked over when the gap is large
+    """
+
+    MODES = ('all', 'fps', 'count', 'budget')
+
+    def __init__(self, mode=VISUAL_SAMPLE_MODE, target_fps=VISUAL_SAMPLE_FPS,
+                 max_frames=VISUAL_SAMPLE_FRAMES, time_budget=VISUAL_TIME_BUDGET,
+                 seek_threshold=30):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown frame sampling mode: {mode}")
+        self.mode = mode
+        self.target_fps = target_fps
+        self.max_frames = max_frames
+        self.time_budget = time_budget
+        self.seek_threshold = seek_threshold
+
+    def select_indices(self, frame_count, fps, start=0, end=None):
+        """Return the sorted frame indices this sampler will analyze within [start, end)"""
+        end = frame_count if end is None else min(end, frame_count)
+        if end <= start:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.mode == 'all':
+            return np.arange(start, end)
+
+        if self.mode == 'fps':
+            step = max(1.0, fps / self.target_fps) if fps > 0 else 1.0
+            return np.unique(np.arange(start, end, step).astype(np.int64))
+
+        # count and budget both spread max_frames across the whole range
+        n = min(self.max_frames, end - start)
+        return np.unique(np.linspace(start, end - 1, n).round().astype(np.int64))
+
+    def sample(self, media, indices=None):
+        """
+        Yield (frame_idx, timestamp, frame) for the selected frames
+        Budget mode yields out of order; sort by frame_idx if order matters
+        """
+        probe = media.probe()
+        fps = probe["fps"] or 30.0
+        if indices is None:
+            indices = self.select_indices(probe["frame_count"], probe["fps"], *media.frame_range())
+
+        for frame_idx, frame in media.iter_frames(lambda cap: self.read_frames(cap, indices)):
+            yield frame_idx, frame_idx / fps, frame
+
+    def read_frames(self, cap, indices, start=0):
+        """Yield (frame_idx, frame) for indices from an open capture positioned at start"""
+        if self.mode == 'budget':
+            return self._read_within_budget(cap, indices)
+        return self.read_sequential(cap, indices, start)
+
+    def read_sequential(self, cap, indices, start=0):
+        """Decode only the frames in sorted indices, given the capture is positioned at start"""
+        current = start
+        for target in indices:
+            target = int(target)
+            if target - current > self.seek_threshold:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                current = target
+            while current < target:
+                if not cap.grab():
+                    return
+                current += 1
+
+            ret, frame = cap.read()
+            current = target + 1
+            if not ret:
+                print(f"WARNING: Could not read frame {target}")
+                continue
+            yield target, frame
+
+    def _read_within_budget(self, cap, indices):
+        start = time.monotonic()
+        for position in _coverage_order(len(indices)):
+            if time.monotonic() - start > self.time_budget:
+                print(f"Frame sampling time budget of {self.time_budget}s reached")
+                return
+            target = int(indices[position])
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ret, frame = cap.read()
+            if not ret:
+                print(f"WARNING: Could not read frame {target}")
+                continue
+            yield target, frame
+
+
+def _coverage_order(n):
+    """
+    Positions 0..n-1 ordered coarse-to-fine, so any prefix covers the
+    whole range roughly evenly (0, n/2, n/4, 3n/4, ...)
+    """
+    order = []
+    seen = set()
+    step = 1
+    while step < n:
+        step *= 2
+    while step >= 1:
+        for position in range(0, n, step):
+            if position not in seen:
+                seen.add(position)
+                order.append(position)
+        step //= 2
+    return order
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .analysis_config import ANALYSIS_WORKERS, ANALYSIS_QUEUE_MAX, JOB_RESULT_TTL, JOB_STORE_DIR
+
+
+class JobQueueFull(Exception):
+    """Raised by submit when every worker is busy and the queue is at its limit"""
+    status_code = 503
+
+
+class JobManager:
+    """
+    Runs long analysis jobs on a background worker pool and tracks their state
+    Jobs move through queued -> running -> completed/failed
+    Job records are JSON files in store_dir, so any web worker process on the
+    host can answer status polls; jobs run in the process that accepted them
+    """
+
+    def __init__(self, max_workers=ANALYSIS_WORKERS, max_queued=ANALYSIS_QUEUE_MAX,
+                 result_ttl=JOB_RESULT_TTL, store_dir=JOB_STORE_DIR):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='analysis-job'
+        )
+        # Each unfinished job holds a spooled upload on disk; bound them per process
+        self.max_pending = max_workers + max_queued
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.result_ttl = result_ttl
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def submit(self, fn, *args, cleanup=None, **kwargs):
+        """
+        Queue fn(*args, report_progress=..., **kwargs) and return the job id
+        cleanup is always called once the job has finished, successfully or not
+        Raises JobQueueFull, without calling cleanup, when the queue is full
+        """
+        self._prune_expired()
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull('Too many analyses in progress. Please try again shortly')
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self._write(job_id, {
+                "id": job_id,
+                "status": "queued",
+                "stage": None,
+                "partial": {},
+                "result": None,
+                "error": None,
+                "status_code": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None
+            })
+            self._executor.submit(self._run, job_id, fn, args, kwargs, cleanup)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if it is unknown or expired"""
+        # Ids are uuid4 hex; anything else must not reach the filesystem
+        if len(job_id) != 32 or not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _run(self, job_id, fn, args, kwargs, cleanup):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def report_progress(stage, partial):
+            self._update(job_id, stage=stage, partial=partial)
+
+        try:
+            result = fn(*args, report_progress=report_progress, **kwargs)
+            self._update(
+                job_id,
+                status="completed",
+                stage="done",
+                result=result,
+                status_code=200,
+                finished_at=time.time()
+            )
+        except Exception as e:
+            print(f"Error in analysis job {job_id}: {e}")
+            self._update(
+                job_id,
+                status="failed",
+                error=str(e),
+                status_code=getattr(e, "status_code", 500),
+                finished_at=time.time()
+            )
+        finally:
+            if cleanup:
+                try:
+                    cleanup()
+                except Exception as e:
+                    print(f"Warning: job {job_id} cleanup failed: {e}")
+            with self._lock:
+                self._pending -= 1
+
+    def _update(self, job_id, partial=None, **fields):
+        # Only the process running a job writes its record
+        with self._lock:
+            job = self.get(job_id)
+            if not job:
+                return
+            job.update(fields)
+            if partial:
+                job["partial"].update(partial)
+            try:
+                self._write(job_id, job)
+            except Exception as e:
+                print(f"Warning: could not update job {job_id}: {e}")
+
+    def _write(self, job_id, job):
+        """Replace the job record atomically so readers never see a partial file"""
+        path = self._path(job_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, default=float)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _prune_expired(self):
+        """Drop job records untouched for the result TTL, finished or orphaned"""
+        cutoff = time.time() - self.result_ttl
+        for entry in os.scandir(self.store_dir):
+            try:
+                if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+
+    def _path(self, job_id):
+        return os.path.join(self.store_dir, f"{job_id}.json")
+
+
+# Create singleton instance
+job_manager = JobManager()
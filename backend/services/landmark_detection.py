@@ -0,0 +1,347 @@
+import multiprocessing
+import queue
+from collections import deque
+import numpy as np
+import mediapipe as mp
+
+from .frame_features import downscale_for_analysis
+
+DETECTOR_KINDS = ("face", "pose", "hands")
+
+FACE_LANDMARKS = 468
+POSE_LANDMARKS = 33
+HAND_LANDMARKS = 21
+MAX_HANDS = 2
+
+# Pose landmark indices used to place the face and hand crops
+NOSE, LEFT_EAR, RIGHT_EAR = 0, 7, 8
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_INDEX, RIGHT_INDEX = 19, 20
+
+# Crops smaller than this (pixels) are too coarse to detect in; crops larger
+# than this share of the frame save too little to be worth it
+MIN_CROP_SIDE = 32
+MAX_CROP_FRACTION = 0.5
+
+
+def create_detector(kind, static_image_mode=False):
+    """
+    Build the MediaPipe graph for one detector kind with the analyzer's settings
+    Tracking mode (the default) carries a region of interest from frame to frame, so
+    only use it on inputs that share one coordinate frame; crops need static_image_mode
+    """
+    if kind == "face":
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=static_image_mode,
+            max_num_faces=1,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    if kind == "pose":
+        return mp.solutions.pose.Pose(
+            static_image_mode=static_image_mode,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    if kind == "hands":
+        return mp.solutions.hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=MAX_HANDS,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5
+        )
+    raise ValueError(f"Unknown detector kind: {kind}")
+
+
+def _to_array(landmarks):
+    return np.array([[point.x, point.y, point.z] for point in landmarks.landmark], dtype=np.float32)
+
+
+def detect(kind, detector, frame_rgb):
+    """
+    Run one detector and return its landmarks as normalized xyz arrays:
+    face (468, 3), pose (33, 3), hands (n_hands, 21, 3), or None if nothing was found
+    """
+    results = detector.process(frame_rgb)
+    if kind == "face":
+        if results.multi_face_landmarks:
+            return _to_array(results.multi_face_landmarks[0])
+    elif kind == "pose":
+        if results.pose_landmarks:
+            return _to_array(results.pose_landmarks)
+    elif kind == "hands":
+        if results.multi_hand_landmarks:
+            return np.stack([_to_array(hand) for hand in results.multi_hand_landmarks[:MAX_HANDS]])
+    return None
+
+
+def _clip_box(x0, y0, x1, y1, width, height):
+    """Integer pixel box clipped to the frame, or None if too small or too large to help"""
+    x0, y0 = max(0, int(x0)), max(0, int(y0))
+    x1, y1 = min(width, int(np.ceil(x1))), min(height, int(np.ceil(y1)))
+    crop_w, crop_h = x1 - x0, y1 - y0
+    if min(crop_w, crop_h) < MIN_CROP_SIDE or crop_w * crop_h > MAX_CROP_FRACTION * width * height:
+        return None
+    return x0, y0, x1, y1
+
+
+def head_region(pose, width, height):
+    """Square pixel box around the head, sized from ear and shoulder spacing"""
+    points = pose[:, :2] * (width, height)
+    ear_span = np.linalg.norm(points[LEFT_EAR] - points[RIGHT_EAR])
+    shoulder_span = np.linalg.norm(points[LEFT_SHOULDER] - points[RIGHT_SHOULDER])
+    half = max(1.25 * ear_span, 0.45 * shoulder_span)
+    cx, cy = points[NOSE]
+    return _clip_box(cx - half, cy - half, cx + half, cy + half, width, height)
+
+
+def hands_region(pose, width, height):
+    """Pixel box around both hands: wrists and index knuckles padded by forearm length"""
+    points = pose[:, :2] * (width, height)
+    hand_points = points[[LEFT_WRIST, RIGHT_WRIST, LEFT_INDEX, RIGHT_INDEX]]
+    pad = max(
+        np.linalg.norm(points[LEFT_ELBOW] - points[LEFT_WRIST]),
+        np.linalg.norm(points[RIGHT_ELBOW] - points[RIGHT_WRIST])
+    )
+    (x0, y0), (x1, y1) = hand_points.min(axis=0) - pad, hand_points.max(axis=0) + pad
+    return _clip_box(x0, y0, x1, y1, width, height)
+
+
+def detect_in_region(kind, detector, frame_rgb, box):
+    """Run a detector on a crop and map its landmarks back to full-frame coordinates"""
+    x0, y0, x1, y1 = box
+    landmarks = detect(kind, detector, np.ascontiguousarray(frame_rgb[y0:y1, x0:x1]))
+    if landmarks is None:
+        return None
+    height, width = frame_rgb.shape[:2]
+    # MediaPipe z shares the x scale, so it shrinks with the crop width too
+    scale = np.array([(x1 - x0) / width, (y1 - y0) / height, (x1 - x0) / width], dtype=np.float32)
+    offset = np.array([x0 / width, y0 / height, 0.0], dtype=np.float32)
+    return landmarks * scale + offset
+
+
+class CascadeDetectors:
+    """
+    Pose first on a small copy of the frame, then face and hands only on crops
+    around the pose-derived head and wrist regions
+    Falls back to the full frame when pose is lost or a crop finds nothing
+    Crops move and resize every frame, so they go to separate static-image graphs;
+    the tracking graphs in detectors only ever see full frames
+    """
+
+    def __init__(self, detectors=None, pose_max_side=320):
+        self._owns_detectors = detectors is None
+        self.detectors = detectors or {kind: create_detector(kind) for kind in DETECTOR_KINDS}
+        self.crop_detectors = {kind: create_detector(kind, static_image_mode=True) for kind in ("face", "hands")}
+        self.pose_max_side = pose_max_side
+
+    def detect_frame(self, frame_rgb):
+        pose = detect("pose", self.detectors["pose"], downscale_for_analysis(frame_rgb, self.pose_max_side))
+        landmarks = {"pose": pose}
+
+        height, width = frame_rgb.shape[:2]
+        regions = {}
+        if pose is not None:
+            regions = {"face": head_region(pose, width, height), "hands": hands_region(pose, width, height)}
+
+        for kind in ("face", "hands"):
+            box = regions.get(kind)
+            found = detect_in_region(kind, self.crop_detectors[kind], frame_rgb, box) if box else None
+            if found is None:
+                found = detect(kind, self.detectors[kind], frame_rgb)
+            landmarks[kind] = found
+        return landmarks
+
+    def map(self, items):
+        """Same interface as StagedDetectors.map, run in this process"""
+        for payload, frame_rgb in items:
+            yield payload, None if frame_rgb is None else self.detect_frame(frame_rgb)
+
+    def close(self):
+        """Release the graphs built here; detectors passed in belong to the caller"""
+        owned = list(self.crop_detectors.values())
+        if self._owns_detectors:
+            owned += list(self.detectors.values())
+        for detector in owned:
+            detector.close()
+
+
+class LandmarkRecorder:
+    """
+    Per-frame landmarks and metrics in preallocated arrays (frame x landmark x xyz),
+    saved as a compressed .npz so scores can be recomputed without re-running detection
+    Missing detections are stored as NaN; arrays grow by doubling if capacity runs out
+    """
+
+    def __init__(self, capacity, metric_names):
+        capacity = max(1, int(capacity))
+        self.metric_names = tuple(metric_names)
+        self.count = 0
+        self.frame_index = np.full(capacity, -1, dtype=np.int64)
+        self.face = np.full((capacity, FACE_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.pose = np.full((capacity, POSE_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.hands = np.full((capacity, MAX_HANDS, HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.metrics = np.zeros((capacity, len(self.metric_names)), dtype=np.float32)
+
+    def _grow(self):
+        for name in ("frame_index", "face", "pose", "hands", "metrics"):
+            array = getattr(self, name)
+            fill = -1 if name == "frame_index" else (0 if name == "metrics" else np.nan)
+            extra = np.full_like(array, fill)
+            setattr(self, name, np.concatenate([array, extra]))
+
+    def record(self, frame_idx, landmarks):
+        """Store one frame's {kind: landmarks} detections; returns its row"""
+        if self.count == len(self.frame_index):
+            self._grow()
+        row = self.count
+        self.frame_index[row] = frame_idx
+        if landmarks.get("face") is not None:
+            self.face[row] = landmarks["face"]
+        if landmarks.get("pose") is not None:
+            self.pose[row] = landmarks["pose"]
+        if landmarks.get("hands") is not None:
+            hands = landmarks["hands"][:MAX_HANDS]
+            self.hands[row, :len(hands)] = hands
+        self.count += 1
+        return row
+
+    def repeat_last(self, frame_idx):
+        """Store a near-duplicate frame as a copy of the previous row"""
+        if self.count == len(self.frame_index):
+            self._grow()
+        row = self.count
+        self.frame_index[row] = frame_idx
+        for name in ("face", "pose", "hands"):
+            array = getattr(self, name)
+            array[row] = array[row - 1]
+        self.count += 1
+        return row
+
+    def set_metrics(self, rows):
+        """Fill the metrics table from per-row sequences ordered like metric_names"""
+        self.metrics[:len(rows)] = rows
+
+    def save(self, path, **extra):
+        n = self.count
+        np.savez_compressed(
+            path,
+            frame_index=self.frame_index[:n],
+            face=self.face[:n],
+            pose=self.pose[:n],
+            hands=self.hands[:n],
+            metrics=self.metrics[:n],
+            metric_names=np.array(self.metric_names),
+            **extra
+        )
+
+
+def _stage_worker(kind, in_queue, out_queue):
+    """Worker process entry point: owns one MediaPipe graph for its whole life"""
+    detector = create_detector(kind)
+    try:
+        while True:
+            item = in_queue.get()
+            if item is None:
+                break
+            seq, frame_rgb = item
+            try:
+                landmarks = detect(kind, detector, frame_rgb)
+            except Exception as e:
+                print(f"Error in {kind} detection: {e}")
+                landmarks = None
+            out_queue.put((seq, kind, landmarks))
+    finally:
+        detector.close()
+
+
+class StagedDetectors:
+    """
+    Runs face, pose and hand detection as separate pipeline stages, one worker
+    process per detector, over a shared stream of frames
+    Bounded input queues give backpressure; results are merged by frame order
+    """
+
+    def __init__(self, kinds=DETECTOR_KINDS, queue_depth=4):
+        self.kinds = tuple(kinds)
+        context = multiprocessing.get_context("spawn")
+        self._out_queue = context.Queue()
+        self._in_queues = {kind: context.Queue(maxsize=queue_depth) for kind in self.kinds}
+        self._workers = [
+            context.Process(
+                target=_stage_worker,
+                args=(kind, self._in_queues[kind], self._out_queue),
+                name=f"{kind}-detector",
+                daemon=True
+            )
+            for kind in self.kinds
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def map(self, items):
+        """
+        For each (payload, frame_rgb) yield (payload, {kind: landmarks}) in input order
+        Items with frame_rgb None are passed through with landmarks None
+        """
+        order = deque()
+        results = {}
+        seq = 0
+
+        for payload, frame_rgb in items:
+            order.append((seq, payload))
+            if frame_rgb is None:
+                results[seq] = None
+            else:
+                results[seq] = {}
+                for kind in self.kinds:
+                    self._in_queues[kind].put((seq, frame_rgb))
+            seq += 1
+
+            self._collect(results, block=False)
+            yield from self._pop_ready(order, results)
+
+        while order:
+            self._collect(results, block=True)
+            yield from self._pop_ready(order, results)
+
+    def _collect(self, results, block):
+        """Move finished detections from the shared output queue into results"""
+        while True:
+            try:
+                seq, kind, landmarks = self._out_queue.get(block=block, timeout=1 if block else None)
+            except queue.Empty:
+                if block and not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError("A detector process exited unexpectedly")
+                return
+            results[seq][kind] = landmarks
+            block = False
+
+    def _pop_ready(self, order, results):
+        while order:
+            seq, payload = order[0]
+            landmarks = results[seq]
+            if landmarks is not None and len(landmarks) < len(self.kinds):
+                return
+            order.popleft()
+            del results[seq]
+            yield payload, landmarks
+
+    def close(self):
+        for kind in self.kinds:
+            try:
+                self._in_queues[kind].put_nowait(None)
+            except queue.Full:
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
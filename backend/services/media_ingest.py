@@ -0,0 +1,167 @@
+import hashlib
+import math
+import os
+import tempfile
+import cv2
+
+from .audio_loader import decode_audio
+from .audio_decode import NoAudioStream
+
+
+class MediaSource:
+    """
+    A video upload spooled to disk once and shared by every analyzer
+    Probing and audio decoding happen lazily and at most once
+    """
+
+    def __init__(self, path, filename=None, owns_file=False, content_hash=None):
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.owns_file = owns_file
+        self._content_hash = content_hash
+        self._probe = None
+        self._audio = {}
+        # (start, end) seconds of the detected performance; None analyzes the whole file
+        self.span = None
+        # False once a decode found no audio track, so later decodes are not attempted
+        self.has_audio = None
+
+    @classmethod
+    def from_upload(cls, video_file, chunk_size=1 << 20):
+        """
+        Spool an uploaded file to a temporary file in fixed-size chunks
+        The SHA-256 of the bytes is computed in the same pass
+        """
+        suffix = os.path.splitext(video_file.filename or '')[1].lower() or '.mp4'
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            video_file.stream.seek(0)
+            while True:
+                chunk = video_file.stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp_file.write(chunk)
+            path = tmp_file.name
+        print(f"Spooled upload {video_file.filename} to {path}")
+        return cls(path, filename=video_file.filename, owns_file=True,
+                   content_hash=digest.hexdigest())
+
+    def content_hash(self, chunk_size=1 << 20):
+        """SHA-256 of the file bytes, hashed from disk if it was not spooled here"""
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    digest.update(chunk)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def probe(self):
+        """Read stream properties once: fps, frame_count, width, height, duration"""
+        if self._probe is None:
+            cap = cv2.VideoCapture(self.path)
+            try:
+                if not cap.isOpened():
+                    raise ValueError(f"Could not open video file {self.filename}")
+                fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                self._probe = {
+                    "fps": fps,
+                    "frame_count": frame_count,
+                    "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    "duration": frame_count / fps if fps > 0 else 0.0
+                }
+            finally:
+                cap.release()
+        return self._probe
+
+    def open_capture(self):
+        """Open a fresh decoder on the spooled file"""
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"Could not open video file {self.filename}")
+        return cap
+
+    def iter_frames(self, read=None):
+        """
+        The one frame iterator over the spooled file: yields (frame_idx, frame)
+        read(cap) picks and decodes the frames from an open capture, e.g. a
+        FrameSampler's read_frames; by default every decodable frame is yielded
+        The decoder is released when iteration ends or is abandoned
+        """
+        cap = self.open_capture()
+        try:
+            yield from (read or _read_all)(cap)
+        finally:
+            cap.release()
+
+    def frame_range(self):
+        """(start_frame, end_frame) of the performance span, end exclusive"""
+        probe = self.probe()
+        frame_count, fps = probe["frame_count"], probe["fps"]
+        if self.span is None or fps <= 0:
+            return 0, frame_count
+        start = min(frame_count, int(self.span[0] * fps))
+        end = min(frame_count, int(math.ceil(self.span[1] * fps)))
+        return start, max(start, end)
+
+    def audio_pcm(self, sr=22050, trimmed=True):
+        """
+        Decode the audio track once per rate to a mono float32 array at sr
+        With trimmed=True only the performance span is returned, as a view
+        """
+        if self.has_audio is False:
+            raise NoAudioStream(f"{self.filename} has no audio track")
+        if sr not in self._audio:
+            try:
+                self._audio[sr] = decode_audio(self.path, sr)
+            except NoAudioStream:
+                self.has_audio = False
+                raise
+        y = self._audio[sr]
+        if trimmed and self.span is not None:
+            y = y[int(self.span[0] * sr):int(math.ceil(self.span[1] * sr))]
+        return y, sr
+
+    def close(self):
+        """Drop decoded data and remove the spooled file if we created it"""
+        self._audio.clear()
+        if self.owns_file and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except Exception as e:
+                print(f"Warning: Could not delete temporary file: {e}")
+
+    def __getstate__(self):
+        # Worker processes get the path and probe only; the parent keeps ownership
+        state = self.__dict__.copy()
+        state["owns_file"] = False
+        state["_audio"] = {}
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _read_all(cap):
+    """Yield (frame_idx, frame) for every decodable frame"""
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame_idx, frame
+        frame_idx += 1
+
+
+def as_media_source(video_file):
+    """Return (media, owned): wraps raw uploads, passes MediaSource through"""
+    if isinstance(video_file, MediaSource):
+        return video_file, False
+    return MediaSource.from_upload(video_file), True
@@ -0,0 +1,48 @@
+import math
+import cv2
+
+from .frame_features import downscale_for_analysis
+
+# Motion is measured on tiny blurred thumbnails; fine detail only adds noise
+MOTION_MAX_SIDE = 160
+
+# Mean absolute difference (0-255) that maps to a movement score of about 6.3/10
+MOTION_ENERGY_SCALE = 6.0
+
+
+def motion_thumbnail(gray, max_side=MOTION_MAX_SIDE):
+    """Small blurred copy of a grayscale frame used for differencing"""
+    small = downscale_for_analysis(gray, max_side)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+class MotionTracker:
+    """
+    Streams frame-difference energy between consecutive sampled frames
+    Only the previous thumbnail is kept, so cost and memory stay small per frame
+    """
+
+    def __init__(self, max_side=MOTION_MAX_SIDE):
+        self.max_side = max_side
+        self._previous = None
+
+    def thumbnail(self, gray):
+        return motion_thumbnail(gray, self.max_side)
+
+    def update(self, gray):
+        """Feed the next grayscale frame; returns motion energy, or None for the first frame"""
+        return self.update_thumbnail(self.thumbnail(gray))
+
+    def update_thumbnail(self, thumbnail):
+        previous, self._previous = self._previous, thumbnail
+        if previous is None or previous.shape != thumbnail.shape:
+            return None
+        return cv2.mean(cv2.absdiff(thumbnail, previous))[0]
+
+    def reset(self):
+        self._previous = None
+
+
+def motion_score(energy):
+    """Map motion energy to a 0-10 movement score that saturates smoothly"""
+    return 10 * (1 - math.exp(-energy / MOTION_ENERGY_SCALE))
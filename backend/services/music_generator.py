@@ -4,11 +4,10 @@ import json
 import requests
 from pathlib import Path
 import base64
-from io import BytesIO
 import tempfile
-import librosa
-import numpy as np
-from music21 import converter, stream, note
+from music21 import converter
+from .audio_loader import audio_loader
+from .transcription import transcribe, notes_to_midi
 
 # Load environment variables
 load_dotenv()
@@ -50,7 +49,8 @@ class MusicGenerator:
             return None
 
     def _audio_to_midi(self, audio_data):
-        """Convert audio to MIDI using librosa"""
+        """Convert audio to MIDI with the shared note transcription"""
+        temp_audio_path = None
         try:
             # Decode base64 audio
             audio_bytes = base64.b64decode(audio_data)
@@ -61,127 +61,47 @@ class MusicGenerator:
                 temp_audio_path = temp_audio.name
 
             print(f"Loading audio file from: {temp_audio_path}")
-            # Load the audio file with specific parameters
-            y, sr = librosa.load(temp_audio_path, sr=22050, mono=True)
+            # Load the audio file at the transcription rate; the temp file is not reused
+            y, sr = audio_loader.load(temp_audio_path, 'transcription', cache=False)
             
-            print("Extracting pitch information...")
-            # Use more robust pitch detection
-            pitches, magnitudes = librosa.piptrack(
-                y=y, 
-                sr=sr,
-                fmin=librosa.note_to_hz('C2'),
-                fmax=librosa.note_to_hz('C7')
+            print("Transcribing notes...")
+            notes = transcribe(
+                y,
+                sr,
+                onset_kwargs=dict(wait=3, pre_avg=3, post_avg=3, pre_max=3, post_max=3)
             )
             
-            print("Detecting onsets...")
-            # Improve onset detection
-            onset_frames = librosa.onset.onset_detect(
-                y=y, 
-                sr=sr,
-                wait=3,
-                pre_avg=3,
-                post_avg=3,
-                pre_max=3,
-                post_max=3
-            )
-            
-            print("Creating MIDI file...")
-            # Create MIDI file
-            pm = pretty_midi.PrettyMIDI(initial_tempo=120)
-            piano_program = pretty_midi.instrument_name_to_program('Acoustic Grand Piano')
-            piano = pretty_midi.Instrument(program=piano_program)
-
-            # Convert detected pitches to MIDI notes
-            onset_times = librosa.frames_to_time(onset_frames, sr=sr)
-            print(f"Found {len(onset_times)} onsets")
-            
-            for i in range(len(onset_times)-1):
-                start_time = onset_times[i]
-                end_time = onset_times[i+1]
-                
-                # Find the strongest pitch in this time frame
-                frame_start = librosa.time_to_frames(start_time, sr=sr)
-                frame_end = librosa.time_to_frames(end_time, sr=sr)
-                
-                if frame_start >= len(pitches) or frame_end >= len(pitches):
-                    continue
-                    
-                pitch_segment = pitches[frame_start:frame_end]
-                mag_segment = magnitudes[frame_start:frame_end]
-                
-                if len(pitch_segment) > 0:
-                    # Get the pitch with the highest magnitude
-                    pitch_idx = np.unravel_index(mag_segment.argmax(), mag_segment.shape)
-                    midi_pitch = int(round(pitch_segment[pitch_idx]))
-                    
-                    # Ensure pitch is in valid MIDI range (0-127)
-                    if 0 <= midi_pitch <= 127:
-                        # Create note with normalized velocity
-                        note = pretty_midi.Note(
-                            velocity=int(min(max(mag_segment.max() * 100, 30), 100)),
-                            pitch=midi_pitch,
-                            start=float(start_time),
-                            end=float(end_time)
-                        )
-                        piano.notes.append(note)
-
-            pm.instruments.append(piano)
-            
-            # Clean up
-            os.unlink(temp_audio_path)
-            
             # Ensure we have some notes
-            if not piano.notes:
+            if not len(notes):
                 print("No valid notes detected in the audio")
                 return None
                 
-            print(f"Successfully created MIDI with {len(piano.notes)} notes")
-            
-            # Convert to bytes
-            midi_buffer = BytesIO()
-            pm.write(midi_buffer)
-            midi_buffer.seek(0)
-            return midi_buffer.read()
+            print(f"Successfully created MIDI with {len(notes)} notes")
+            return notes_to_midi(notes)
 
         except Exception as e:
             print(f"Error converting audio to MIDI: {e}")
             import traceback
             traceback.print_exc()
             return None
+        finally:
+            # Clean up
+            if temp_audio_path and os.path.exists(temp_audio_path):
+                os.unlink(temp_audio_path)
 
     def _midi_to_sheet_music(self, midi_data, session_id):
-        """Convert audio to sheet music using music21"""
+        """Convert MIDI bytes to sheet music using music21"""
+        midi_path = None
         try:
-            # Save audio data to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio:
-                temp_audio.write(base64.b64decode(midi_data))
-                audio_path = temp_audio.name
+            if not midi_data:
+                return None
 
-            # Load the audio file
-            y, sr = librosa.load(audio_path)
-            
-            # Extract pitch
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-            
-            # Get the most prominent pitch at each time
-            pitches_mean = pitches.mean(axis=0)
-            
-            # Convert frequency to MIDI notes
-            midi_notes = librosa.hz_to_midi(pitches_mean[pitches_mean > 0])
-            
-            # Round to nearest semitone
-            midi_notes = np.round(midi_notes)
-            
-            # Create a music21 stream
-            score_stream = stream.Stream()
-            
-            # Convert MIDI notes to music21 notes
-            for midi_note in midi_notes:
-                if np.isnan(midi_note):
-                    continue
-                    
-                new_note = note.Note(int(midi_note), quarterLength=1.0)
-                score_stream.append(new_note)
+            # Save MIDI data to a temporary file for music21
+            with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as temp_midi:
+                temp_midi.write(midi_data)
+                midi_path = temp_midi.name
+
+            score_stream = converter.parse(midi_path)
 
             # Set up output path
             output_dir = Path("static/sheet_music").resolve()
@@ -191,9 +111,6 @@ class MusicGenerator:
             # Save as PDF
             score_stream.write('musicxml.pdf', fp=str(output_path))
             
-            # Clean up
-            os.unlink(audio_path)
-            
             if output_path.exists():
                 print(f"Successfully created sheet music at: {output_path}")
                 return str(output_path)
@@ -204,6 +121,10 @@ class MusicGenerator:
         except Exception as e:
             print(f"Error converting to sheet music: {e}")
             return None
+        finally:
+            # Clean up
+            if midi_path and os.path.exists(midi_path):
+                os.unlink(midi_path)
 
     def _generate_with_topmedia(self, skill_level, instrument, style):
         """Generate music using TopMediaAI API"""
@@ -399,8 +320,8 @@ Focus on creating a complete musical journey that develops within exactly one mi
             with open(test_file, 'rb') as f:
                 audio_data = base64.b64encode(f.read()).decode('utf-8')
 
-            # Generate sheet music
-            sheet_music_path = self._midi_to_sheet_music(audio_data, session_id)
+            # Transcribe to MIDI, then generate sheet music
+            sheet_music_path = self._midi_to_sheet_music(self._audio_to_midi(audio_data), session_id)
 
             if sheet_music_path:
                 return {
@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError
+from .ai_services import (
+    analyze_visual_performance,
+    generate_practice_recommendations,
+    generate_performance_summary
+)
+from .audio_processor import analyze_audio_performance
+from .media_ingest import as_media_source
+from .activity_detection import detect_performance_span
+from .result_cache import result_cache
+from .deadlines import deadline_after
+from utils.formatters import iter_feedback_aspects
+from .analysis_config import (
+    ANALYSIS_EXECUTION_MODE,
+    ANALYSIS_WORKERS,
+    VISUAL_BRANCH_TIMEOUT,
+    AUDIO_BRANCH_TIMEOUT,
+    RESULT_CACHE_ENABLED,
+    analysis_params
+)
+
+# Add the repository root to sys.path to import from Main.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from Main import get_style_rating
+
+
+class AnalysisError(Exception):
+    """Raised when a pipeline stage cannot produce usable feedback"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Branch executors are shared across requests and created on first use
+_branch_executors = {}
+_branch_executors_lock = threading.Lock()
+
+
+def _get_branch_executor(mode):
+    with _branch_executors_lock:
+        if mode not in _branch_executors:
+            # Two branches per in-flight analysis
+            if mode == 'process':
+                # Spawned, not forked, for the same reason as the segment pool:
+                # request, job and decoder threads may hold locks at fork time
+                _branch_executors[mode] = ProcessPoolExecutor(
+                    max_workers=2 * ANALYSIS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _branch_executors[mode] = ThreadPoolExecutor(max_workers=2 * ANALYSIS_WORKERS)
+        return _branch_executors[mode]
+
+
+def _join_branch(future, name, deadline):
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except TimeoutError:
+        # A running branch cannot be cancelled; it sees the same deadline and
+        # stops at its next check, releasing its executor slot
+        future.cancel()
+        raise AnalysisError(f'{name.capitalize()} analysis timed out. Please try a shorter video', 504)
+
+
+def _run_serial_branch(analyze, media, name, timeout):
+    """Run one branch in this thread under its own deadline"""
+    deadline = deadline_after(timeout)
+    feedback = analyze(media, deadline)
+    if feedback is None and time.time() > deadline:
+        raise AnalysisError(f'{name.capitalize()} analysis timed out. Please try a shorter video', 504)
+    return feedback
+
+
+# Keys analyzers return beside their scored aspects; the response carries them
+# elsewhere, since clients chart every feedback key except "score" as an aspect
+_BRANCH_EXTRAS = ('degraded', 'timeline', 'technical_data')
+
+
+def _aspect_feedback(feedback):
+    return {key: value for key, value in feedback.items() if key not in _BRANCH_EXTRAS}
+
+
+def _run_branches(media, report_progress, mode=ANALYSIS_EXECUTION_MODE):
+    """
+    Run the independent visual and audio branches, joining both before recommendations
+    mode is 'serial', 'thread' (OpenCV/NumPy release the GIL) or 'process'
+    """
+    if mode == 'serial':
+        # One after the other, each with its full timeout from when it starts
+        visual_feedback = _run_serial_branch(analyze_visual_performance, media, 'visual', VISUAL_BRANCH_TIMEOUT)
+        if visual_feedback:
+            report_progress('visual', {'visual_feedback': _aspect_feedback(visual_feedback)})
+        audio_feedback = _run_serial_branch(analyze_audio_performance, media, 'audio', AUDIO_BRANCH_TIMEOUT)
+        return visual_feedback, audio_feedback
+
+    executor = _get_branch_executor(mode)
+    start = time.monotonic()
+    visual_future = executor.submit(analyze_visual_performance, media, deadline_after(VISUAL_BRANCH_TIMEOUT))
+    audio_future = executor.submit(analyze_audio_performance, media, deadline_after(AUDIO_BRANCH_TIMEOUT))
+
+    visual_feedback = _join_branch(visual_future, 'visual', start + VISUAL_BRANCH_TIMEOUT)
+    if visual_feedback:
+        report_progress('visual', {'visual_feedback': _aspect_feedback(visual_feedback)})
+    audio_feedback = _join_branch(audio_future, 'audio', start + AUDIO_BRANCH_TIMEOUT)
+    return visual_feedback, audio_feedback
+
+
+def run_performance_analysis(video_file, report_progress=None):
+    """
+    Runs the full performance analysis pipeline on an uploaded video or MediaSource
+    report_progress(stage, partial) is called after each stage with the results so far
+    """
+    if report_progress is None:
+        report_progress = lambda stage, partial: None
+
+    # Spool the upload once; both branches read the same file and decoded data
+    media, owns_media = as_media_source(video_file)
+    try:
+        params = analysis_params()
+        if not RESULT_CACHE_ENABLED:
+            return _analyze_media(media, params, report_progress)[0]
+
+        # Identical uploads with identical settings are served without decoding
+        cache_key = result_cache.make_key(media.content_hash(), params)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            print(f"Serving cached analysis for {media.filename}")
+            return cached
+
+        result, complete = _analyze_media(media, params, report_progress)
+        # Fallbacks from a transient failure must not be served for this upload forever
+        if complete:
+            result_cache.put(cache_key, result)
+        else:
+            print(f"Not caching partial analysis of {media.filename}")
+        return result
+    finally:
+        if owns_media:
+            media.close()
+
+
+def _detect_span(media, params):
+    """
+    Trim dead time before and after the performance; analysis continues untrimmed on failure
+    Returns (span, ok) with ok False only when detection failed
+    """
+    if not params['activity_trim']['enabled']:
+        return None, True
+    try:
+        return detect_performance_span(media), True
+    except Exception as e:
+        print(f"Warning: performance detection failed, analyzing the whole file: {e}")
+        media.span = None
+        return None, False
+
+
+def _analyze_media(media, params, report_progress):
+    """
+    Returns (result, complete); complete is False when trimming, an analyzer,
+    recommendations or the summary failed and the result carries fallbacks instead
+    """
+    performance_span, span_ok = _detect_span(media, params)
+    if performance_span:
+        report_progress('activity', {'performance_span': performance_span})
+
+    # Get raw feedback without style ratings
+    visual_feedback, audio_feedback = _run_branches(media, report_progress)
+    if not visual_feedback:
+        raise AnalysisError('Visual analysis failed. Please ensure good lighting and clear video')
+    if not audio_feedback:
+        raise AnalysisError('Audio analysis failed. Please ensure clear audio')
+    # Error fallbacks are served but never cached
+    degraded = bool(visual_feedback.pop('degraded', False)) | bool(audio_feedback.pop('degraded', False))
+    visual_timeline = visual_feedback.pop('timeline', None)
+    audio_technical_data = audio_feedback.pop('technical_data', None)
+    report_progress('audio', {'audio_feedback': audio_feedback})
+
+    # Add style ratings to each aspect of visual feedback
+    for aspect, data in iter_feedback_aspects(visual_feedback):
+        data["style_rating"] = get_style_rating(data["score"])
+
+    # Add style ratings to each aspect of audio feedback
+    for aspect, data in iter_feedback_aspects(audio_feedback):
+        data["style_rating"] = get_style_rating(data["score"])
+
+    education_tips = generate_practice_recommendations(
+        visual_feedback,
+        audio_feedback,
+        skill_level=params['skill_level']
+    )
+    report_progress('recommendations', {'education_tips': education_tips})
+
+    # Calculate grades using the imported get_style_rating
+    visual_grade = get_style_rating(visual_feedback["score"])
+    audio_grade = get_style_rating(audio_feedback["score"])
+
+    # Calculate overall grade with ULTRA condition
+    if visual_grade[0] == "SSS" and audio_grade[0] == "SSS":
+        overall_grade = ("ULTRA", "#FFD700")
+    else:
+        overall_score = (visual_feedback["score"] + audio_feedback["score"]) / 2
+        overall_grade = get_style_rating(overall_score)
+
+    # Generate overall performance summary
+    performance_summary = generate_performance_summary(visual_feedback, audio_feedback)
+    complete = (
+        span_ok and not degraded
+        and education_tips is not None and performance_summary is not None
+    )
+    if performance_summary is None:
+        performance_summary = "Performance analysis summary unavailable."
+
+    return {
+        'visual_feedback': visual_feedback,
+        'audio_feedback': audio_feedback,
+        'audio_technical_data': audio_technical_data,
+        'education_tips': education_tips,
+        'performance_span': performance_span,
+        'visual_timeline': visual_timeline,
+        'summary': {
+            'visual_grade': visual_grade,
+            'audio_grade': audio_grade,
+            'overall_grade': overall_grade,
+            'performance_summary': performance_summary
+        }
+    }, complete
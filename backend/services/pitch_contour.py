@@ -0,0 +1,140 @@
+import numpy as np
+from dataclasses import dataclass
+from scipy import fft as sp_fft
+
+# Spread (cents) of deviations that are uniformly random over a semitone
+UNIFORM_CENTS_STD = 50 / np.sqrt(3)
+
+
+@dataclass
+class PitchContour:
+    f0: np.ndarray       # Fundamental frequency per frame in Hz, 0 where unvoiced
+    voiced: np.ndarray   # True where the frame is periodic enough to carry a pitch
+    cents: np.ndarray    # Deviation from the nearest equal-tempered semitone, NaN where unvoiced
+
+    @classmethod
+    def from_f0(cls, f0):
+        f0 = np.asarray(f0, dtype=np.float32)
+        voiced = f0 > 0
+        cents = np.full(f0.shape, np.nan, dtype=np.float32)
+        midi = 69 + 12 * np.log2(f0[voiced] / 440.0)
+        cents[voiced] = 100 * (midi - np.round(midi))
+        return cls(f0=f0, voiced=voiced, cents=cents)
+
+    @property
+    def voiced_f0(self):
+        return self.f0[self.voiced]
+
+    @property
+    def voiced_ratio(self):
+        return float(self.voiced.mean()) if self.voiced.size else 0.0
+
+    @property
+    def mean_abs_cents(self):
+        cents = self.cents[self.voiced]
+        return float(np.abs(cents).mean()) if cents.size else 0.0
+
+    @property
+    def intonation_accuracy(self):
+        """1 when voiced frames sit on semitones, 0 at a quarter tone off on average"""
+        if not self.voiced.any():
+            return 0.0
+        return float(1.0 - self.mean_abs_cents / 50.0)
+
+    @property
+    def intonation_stability(self):
+        """1 for a steady offset from the semitone grid, 0 for offsets as random as chance"""
+        cents = self.cents[self.voiced]
+        if not cents.size:
+            return 0.0
+        return float(np.clip(1.0 - cents.std() / UNIFORM_CENTS_STD, 0.0, 1.0))
+
+
+def _difference_function(frames, max_tau, power, starts):
+    """
+    YIN difference d(tau) for each frame (rows) and lag 0..max_tau
+    d(tau) = sum_j (x_j - x_{j+tau})^2 over a window of frame_length - max_tau samples,
+    expanded into window energies, read from power (cumulative signal power) at the
+    frame starts, minus twice the frame/head cross-correlation taken by FFT
+    """
+    frame_length = frames.shape[1]
+    window = frame_length - max_tau
+    # Lags up to max_tau never wrap around a frame_length transform, so no padding;
+    # single-precision transforms are plenty for a correlation that is thresholded
+    spectrum = sp_fft.rfft(frames, axis=1)
+    head = sp_fft.rfft(frames[:, :window], frame_length, axis=1)
+    correlation = sp_fft.irfft(spectrum * np.conj(head), frame_length, axis=1)[:, :max_tau + 1]
+
+    lagged = starts[:, None] + np.arange(max_tau + 1)
+    energy_lagged = power[lagged + window] - power[lagged]
+    energy_head = energy_lagged[:, :1]
+    return np.maximum(energy_head + energy_lagged - 2 * correlation, 0.0)
+
+
+def _yin_frames(frames, sr, min_tau, max_tau, threshold, power, starts):
+    difference = _difference_function(frames, max_tau, power, starts)
+
+    # Cumulative mean normalized difference
+    cumulative = np.cumsum(difference[:, 1:], axis=1)
+    normalized = np.ones_like(difference)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized[:, 1:] = difference[:, 1:] * np.arange(1, max_tau + 1) / cumulative
+    normalized = np.nan_to_num(normalized, nan=1.0, posinf=1.0)
+
+    # First local minimum under the threshold within the allowed lag range
+    search = normalized[:, min_tau - 1:max_tau + 1]
+    troughs = (search[:, 1:-1] < search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+    candidates = troughs & (search[:, 1:-1] < threshold)
+    voiced = candidates.any(axis=1)
+    tau = np.argmax(candidates, axis=1) + min_tau
+
+    # Parabolic interpolation around the chosen lag for sub-sample precision
+    rows = np.arange(len(frames))
+    left, centre, right = normalized[rows, tau - 1], normalized[rows, tau], normalized[rows, tau + 1]
+    curvature = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(np.abs(curvature) > 1e-12, 0.5 * (left - right) / curvature, 0.0)
+    period = tau + np.clip(shift, -1.0, 1.0)
+
+    return np.where(voiced, sr / period, 0.0)
+
+
+def pitch_contour(y, sr, frame_length=2048, hop_length=512, fmin=65.0, fmax=2093.0,
+                  threshold=0.1, silence_rms=1e-3, center=True, chunk_frames=1024, win_length=None):
+    """
+    Vectorized YIN: one f0 per frame with a voiced mask and cents deviation
+    Frames line up with librosa STFT frames of the same frame_length/hop_length/center
+    YIN runs on the central win_length samples of each frame; by default the smallest
+    power of two holding two periods of fmin, which keeps the FFTs short
+    Frames quieter than silence_rms count as unvoiced; work is done chunk_frames
+    frames at a time so memory stays bounded on long signals
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if center:
+        y = np.pad(y, frame_length // 2)
+    if len(y) < frame_length:
+        return PitchContour.from_f0(np.zeros(0, dtype=np.float32))
+
+    if win_length is None:
+        win_length = 1 << int(np.ceil(np.log2(2 * np.ceil(sr / fmin))))
+    win_length = min(win_length, frame_length)
+    min_tau = max(2, int(np.floor(sr / fmax)))
+    max_tau = min(win_length // 2, int(np.ceil(sr / fmin)))
+
+    n_frames = 1 + (len(y) - frame_length) // hop_length
+    frame_starts = np.arange(n_frames) * hop_length
+    offset = (frame_length - win_length) // 2
+    windows = np.lib.stride_tricks.sliding_window_view(y, win_length)[offset::hop_length][:n_frames]
+
+    # Every window energy is a difference of one running sum of signal power
+    power = np.zeros(len(y) + 1)
+    np.cumsum(np.square(y, dtype=np.float64), out=power[1:])
+    frame_rms = np.sqrt(np.maximum(power[frame_starts + frame_length] - power[frame_starts], 0.0) / frame_length)
+
+    f0 = np.zeros(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, chunk_frames):
+        chunk = np.ascontiguousarray(windows[start:start + chunk_frames])
+        starts = frame_starts[start:start + len(chunk)] + offset
+        chunk_f0 = _yin_frames(chunk, sr, min_tau, max_tau, threshold, power, starts)
+        f0[start:start + len(chunk)] = np.where(frame_rms[start:start + len(chunk)] >= silence_rms, chunk_f0, 0.0)
+    return PitchContour.from_f0(f0)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+
+from .analysis_config import (
+    ANALYZER_VERSION,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES
+)
+
+
+class ResultCache:
+    """
+    On-disk store of finished analysis payloads keyed by content hash
+    File mtimes track recency; the least recently used entries are evicted
+    once the store grows past max_bytes
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, content_hash, params):
+        """Combine the upload hash with analyzer version and parameters"""
+        key_source = json.dumps({
+            "content": content_hash,
+            "version": ANALYZER_VERSION,
+            "params": params
+        }, sort_keys=True)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached payload, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # Mark as recently used
+            os.utime(path, None)
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: dropping unreadable cache entry {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key, value):
+        """Store a payload atomically, then evict down to the size bound"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=float)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: could not write cache entry {key}: {e}")
+            self._remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            # Oldest access first
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+# Create singleton instance
+result_cache = ResultCache()
@@ -0,0 +1,237 @@
+import multiprocessing
+import threading
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .analysis_config import VISUAL_SEGMENT_WORKERS, VISUAL_MIN_SEGMENT_FRAMES
+from .frame_features import to_analysis_gray
+from .frame_pipeline import prefetch, ordered_map
+from .motion_analysis import MotionTracker, motion_score, motion_thumbnail
+from .frame_hash import DuplicateFilter
+from .streaming_stats import RunningStats
+from .deadlines import check_deadline
+
+VISUAL_ASPECTS = ("expressiveness", "movement", "technique")
+
+# Worker processes are shared across analyses and created on first use. They are
+# spawned, not forked: the pool starts from a threaded Flask process, and forking
+# while decoder or OpenCV threads hold locks can deadlock the child
+_segment_executor = None
+_segment_executor_lock = threading.Lock()
+
+
+def _get_segment_executor():
+    global _segment_executor
+    with _segment_executor_lock:
+        if _segment_executor is None:
+            _segment_executor = ProcessPoolExecutor(
+                max_workers=VISUAL_SEGMENT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _segment_executor
+
+
+class _SamplePreparer:
+    """
+    Runs on the decoder thread, in stream order: converts frames to small
+    grayscale plus a motion thumbnail, and flags near-duplicates of the last scored frame
+    """
+
+    def __init__(self):
+        self.duplicates = DuplicateFilter()
+
+    def __call__(self, sample):
+        frame_idx, timestamp, frame = sample
+        gray = to_analysis_gray(frame)
+        thumbnail = motion_thumbnail(gray)
+        return frame_idx, timestamp, gray, thumbnail, self.duplicates.is_duplicate(gray, thumbnail)
+
+
+def _empty_aggregate():
+    return {
+        "count": 0,
+        "stats": {aspect: RunningStats(0.0, 10.0) for aspect in VISUAL_ASPECTS},
+        "timeline": []
+    }
+
+
+def _add_to_stats(aggregate, sample):
+    for aspect in VISUAL_ASPECTS:
+        if aspect in sample:
+            aggregate["stats"][aspect].add(sample[aspect])
+
+
+def _add_motion(sample, energy):
+    # The first frame of a stream has no predecessor and therefore no movement score
+    if energy is not None:
+        sample["motion_energy"] = round(energy, 3)
+        sample["movement"] = motion_score(energy)
+
+
+def score_frames(frames, score_fn, in_order=True, keep_timeline=True, seed_index=None, deadline=None):
+    """
+    Score (frame_idx, timestamp, frame) samples and reduce them to an aggregate:
+    sample count, streaming per-aspect statistics, and the per-sample timeline
+    score_fn(gray) returns per-frame aspect scores; movement comes from the
+    motion between consecutive samples. Near-duplicate frames reuse the last
+    scores and count once each in the averages. Set in_order=False when samples arrive
+    out of time order, so motion is computed after sorting
+    With keep_timeline=False in-order samples are folded into the statistics and
+    dropped, so memory stays constant however long the video is
+    seed_index is the sample just before frames when they are one segment of a
+    longer run; if frames starts with it, it primes motion, duplicate detection
+    and reused scores but is not counted
+    Raises TimeoutError once the wall-clock deadline passes, so an abandoned
+    analysis stops reading the file within one sample
+    Decoding runs ahead on its own thread while scorer threads consume frames
+    """
+    motion = MotionTracker()
+    thumbnails = {}
+    timeline = []
+    last_scores = None
+    aggregate = _empty_aggregate()
+    seed_thumbnail = None
+
+    # Near-duplicates skip scoring and reuse the scores of the frame they match
+    scored = ordered_map(
+        lambda sample: sample[:4] + (None if sample[4] else score_fn(sample[2]),),
+        prefetch(frames, transform=_SamplePreparer())
+    )
+    for frame_idx, timestamp, gray, thumbnail, frame_scores in scored:
+        check_deadline(deadline, "Visual analysis")
+        reused = frame_scores is None and last_scores is not None
+        if frame_scores is None:
+            frame_scores = last_scores if reused else score_fn(gray)
+        last_scores = frame_scores
+
+        if seed_index is not None and frame_idx == seed_index:
+            seed_thumbnail = thumbnail
+            if in_order:
+                motion.update_thumbnail(thumbnail)
+            continue
+
+        sample = {
+            "frame": int(frame_idx),
+            "time": round(timestamp, 3),
+            **{aspect: float(score) for aspect, score in frame_scores.items()}
+        }
+        if reused:
+            sample["reused"] = True
+        aggregate["count"] += 1
+        if in_order:
+            _add_motion(sample, motion.update_thumbnail(thumbnail))
+            _add_to_stats(aggregate, sample)
+        else:
+            thumbnails[sample["frame"]] = thumbnail
+        if keep_timeline or not in_order:
+            timeline.append(sample)
+
+    timeline.sort(key=lambda sample: sample["frame"])
+    if not in_order:
+        if seed_thumbnail is not None:
+            motion.update_thumbnail(seed_thumbnail)
+        for sample in timeline:
+            _add_motion(sample, motion.update_thumbnail(thumbnails[sample["frame"]]))
+            _add_to_stats(aggregate, sample)
+
+    aggregate["timeline"] = timeline if keep_timeline else []
+    return aggregate
+
+
+def merge_aggregates(aggregates):
+    """Combine per-segment aggregates into one, timeline ordered by frame"""
+    merged = _empty_aggregate()
+    for aggregate in aggregates:
+        merged["count"] += aggregate["count"]
+        for aspect in VISUAL_ASPECTS:
+            merged["stats"][aspect].merge(aggregate["stats"][aspect])
+        merged["timeline"].extend(aggregate["timeline"])
+    merged["timeline"].sort(key=lambda sample: sample["frame"])
+    return merged
+
+
+def aggregate_means(aggregate, default=0.0):
+    """Mean score per aspect; default for aspects with no samples"""
+    return {
+        aspect: aggregate["stats"][aspect].mean if aggregate["stats"][aspect].count else default
+        for aspect in VISUAL_ASPECTS
+    }
+
+
+def _score_segment(media, fps, indices, sampler, score_fn, keep_timeline, seed_index=None, deadline=None):
+    """
+    Worker entry point: open a private decoder, seek to the segment and score it
+    seed_index is the last sample of the previous segment; it is decoded first so
+    movement and duplicate detection carry across the boundary as in a single pass
+    """
+    frames = (
+        (frame_idx, frame_idx / fps, frame)
+        for frame_idx, frame in media.iter_frames(
+            lambda cap: _read_segment(cap, sampler, indices, seed_index)
+        )
+    )
+    return score_frames(
+        frames,
+        score_fn,
+        in_order=sampler.mode != 'budget',
+        keep_timeline=keep_timeline,
+        seed_index=seed_index,
+        deadline=deadline
+    )
+
+
+def _read_segment(cap, sampler, indices, seed_index=None):
+    """Seek to the segment and yield its (frame_idx, frame), the seed sample first"""
+    start = int(indices[0]) if seed_index is None else int(seed_index)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if seed_index is not None:
+        yield from sampler.read_sequential(cap, [start], start=start)
+        start += 1
+    yield from sampler.read_frames(cap, indices, start=start)
+
+
+def plan_segments(indices, workers=VISUAL_SEGMENT_WORKERS, min_frames=VISUAL_MIN_SEGMENT_FRAMES):
+    """Split sorted sample indices into contiguous time segments, one per worker at most"""
+    n_segments = min(workers, len(indices) // max(1, min_frames))
+    if n_segments <= 1:
+        return [indices]
+    return [segment for segment in np.array_split(indices, n_segments) if len(segment)]
+
+
+def analyze_segments(media, sampler, score_fn, keep_timeline=True, deadline=None):
+    """
+    Score the sampled frames of a video, in parallel worker processes when it is
+    long enough to split, and return the merged aggregate
+    score_fn must be a module-level function so it can be sent to workers;
+    every worker stops with TimeoutError once deadline (wall clock) passes
+    """
+    probe = media.probe()
+    fps = probe["fps"] or 30.0
+    # Only frames inside the detected performance span
+    indices = sampler.select_indices(probe["frame_count"], probe["fps"], *media.frame_range())
+    # Inside a worker process (ANALYSIS_EXECUTION_MODE=process) each analysis already
+    # has a process of its own; a nested pool per worker would oversubscribe the CPUs
+    in_worker = multiprocessing.parent_process() is not None
+    segments = plan_segments(indices, workers=1 if in_worker else VISUAL_SEGMENT_WORKERS)
+
+    if len(segments) <= 1:
+        return score_frames(
+            sampler.sample(media, indices),
+            score_fn,
+            in_order=sampler.mode != 'budget',
+            keep_timeline=keep_timeline,
+            deadline=deadline
+        )
+
+    print(f"Scoring {len(indices)} frames in {len(segments)} parallel segments")
+    executor = _get_segment_executor()
+    # Each segment after the first is seeded with the sample that precedes it
+    seeds = [None] + [int(segment[-1]) for segment in segments[:-1]]
+    futures = [
+        executor.submit(
+            _score_segment, media, fps, segment.tolist(), sampler, score_fn, keep_timeline, seed, deadline
+        )
+        for segment, seed in zip(segments, seeds)
+    ]
+    return merge_aggregates(future.result() for future in futures)
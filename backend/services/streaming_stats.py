@@ -0,0 +1,130 @@
+import math
+import numpy as np
+
+
+class RunningStats:
+    """
+    Streaming count/mean/variance/min/max (Welford) plus a fixed-bucket histogram
+    Memory is constant however many values are added; two accumulators can be merged
+    """
+    __slots__ = ("low", "high", "count", "mean", "_m2", "min", "max", "histogram")
+
+    def __init__(self, low=0.0, high=10.0, bins=10):
+        self.low = low
+        self.high = high
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = [0] * bins
+
+    @classmethod
+    def from_values(cls, values, low=0.0, high=10.0, bins=10):
+        """Accumulator for a whole array at once, ready to merge with others"""
+        stats = cls(low, high, bins)
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size:
+            stats.count = int(values.size)
+            stats.mean = float(values.mean())
+            stats._m2 = float(((values - stats.mean) ** 2).sum())
+            stats.min = float(values.min())
+            stats.max = float(values.max())
+            counts, _ = np.histogram(np.clip(values, low, high), bins=bins, range=(low, high))
+            stats.histogram = counts.tolist()
+        return stats
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.histogram[self._bucket(value)] += 1
+
+    def _bucket(self, value):
+        bins = len(self.histogram)
+        position = (value - self.low) / (self.high - self.low) * bins
+        return min(max(int(position), 0), bins - 1)
+
+    def merge(self, other):
+        """Fold another accumulator with the same buckets into this one"""
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        return self
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "histogram": {
+                "low": self.low,
+                "high": self.high,
+                "counts": list(self.histogram)
+            }
+        }
+
+
+class MetricTimeline:
+    """
+    Append-only float32 table with one row per frame and one column per metric
+    Rows live in a single array grown by doubling, not in per-frame Python objects
+    """
+    __slots__ = ("names", "count", "_rows")
+
+    def __init__(self, names, capacity=256):
+        self.names = tuple(names)
+        self.count = 0
+        self._rows = np.zeros((max(1, capacity), len(self.names)), dtype=np.float32)
+
+    def append(self, values):
+        """Add one row, values ordered like names; returns its index"""
+        if self.count == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.zeros_like(self._rows)])
+        self._rows[self.count] = values
+        self.count += 1
+        return self.count - 1
+
+    def extend(self, rows):
+        """Add a block of rows at once"""
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, len(self.names))
+        while self.count + len(rows) > len(self._rows):
+            self._rows = np.concatenate([self._rows, np.zeros_like(self._rows)])
+        self._rows[self.count:self.count + len(rows)] = rows
+        self.count += len(rows)
+
+    def repeat_last(self):
+        return self.append(self._rows[self.count - 1])
+
+    def column(self, name):
+        """Writable view of one metric over the rows added so far"""
+        return self._rows[:self.count, self.names.index(name)]
+
+    def rows(self):
+        return self._rows[:self.count]
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,114 @@
+from io import BytesIO
+import numpy as np
+import librosa
+import pretty_midi
+from music21 import stream, note, tempo as m21_tempo
+
+from .audio_features import AudioFeatures
+from .pitch_contour import pitch_contour
+
+# One row per note: onset and release in seconds, MIDI pitch and MIDI velocity
+NOTE_DTYPE = np.dtype([
+    ('start', np.float32),
+    ('end', np.float32),
+    ('pitch', np.int16),
+    ('velocity', np.int16)
+])
+
+# Velocity 1 sits this many dB below the loudest note
+VELOCITY_RANGE_DB = 40.0
+
+
+def transcribe(y, sr, hop_length=512, frame_length=2048, fmin=65.4, fmax=2093.0,
+               min_duration=0.05, min_voiced=0.5, onset_kwargs=None):
+    """
+    Segment a monophonic signal into notes from onsets and the YIN f0 contour
+    Frame 0 and each onset start a segment that runs to the next onset; a segment becomes a
+    note if at least min_voiced of its frames carry a pitch. Pitch is the mean
+    voiced MIDI value, the note ends at its last voiced frame, and velocity follows
+    peak RMS. All per-segment work is done with np.ufunc.reduceat
+    fmin/fmax default to C2-C7; returns a NOTE_DTYPE array ordered by start
+    """
+    features = AudioFeatures(y, sr, n_fft=frame_length, hop_length=hop_length)
+    contour = pitch_contour(y, sr, frame_length=frame_length, hop_length=hop_length, fmin=fmin, fmax=fmax)
+    n_frames = min(len(contour.f0), len(features.onset_envelope), len(features.rms))
+    if n_frames == 0:
+        return np.zeros(0, dtype=NOTE_DTYPE)
+
+    onsets = librosa.onset.onset_detect(
+        onset_envelope=features.onset_envelope[:n_frames],
+        sr=sr,
+        hop_length=hop_length,
+        **(onset_kwargs or {})
+    )
+    # A note already sounding at frame 0 has no onset to detect, so the leading frames
+    # always form a segment; the voicing test below drops it if nothing is playing
+    starts = np.unique(np.append(onsets[onsets < n_frames], 0)).astype(np.int64)
+    lengths = np.diff(np.append(starts, n_frames))
+
+    voiced = contour.voiced[:n_frames]
+    midi = np.zeros(n_frames)
+    midi[voiced] = librosa.hz_to_midi(contour.f0[:n_frames][voiced])
+    frame_index = np.arange(n_frames)
+
+    voiced_count = np.add.reduceat(voiced.astype(np.int64), starts)
+    midi_sum = np.add.reduceat(midi, starts)
+    last_voiced = np.maximum.reduceat(np.where(voiced, frame_index, -1), starts)
+    peak_rms = np.maximum.reduceat(features.rms[:n_frames], starts)
+
+    begin = librosa.frames_to_time(starts, sr=sr, hop_length=hop_length)
+    end = librosa.frames_to_time(last_voiced + 1, sr=sr, hop_length=hop_length)
+
+    # Segments without voiced frames get a NaN pitch and are dropped here
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pitch = np.round(midi_sum / voiced_count)
+        keep = (
+            (voiced_count >= min_voiced * lengths)
+            & (voiced_count > 0)
+            & (end - begin >= min_duration)
+            & (pitch >= 0) & (pitch <= 127)
+        )
+
+    level_db = 20 * np.log10(np.maximum(peak_rms, 1e-10) / max(float(peak_rms[keep].max(initial=0.0)), 1e-10))
+    velocity = np.clip(np.round(127 * (1 + level_db / VELOCITY_RANGE_DB)), 1, 127)
+
+    notes = np.zeros(int(keep.sum()), dtype=NOTE_DTYPE)
+    notes['start'] = begin[keep]
+    notes['end'] = end[keep]
+    notes['pitch'] = pitch[keep]
+    notes['velocity'] = velocity[keep]
+    return notes
+
+
+def notes_to_midi(notes, bpm=120, program_name='Acoustic Grand Piano'):
+    """Render a note array as Standard MIDI File bytes"""
+    pm = pretty_midi.PrettyMIDI(initial_tempo=bpm)
+    track = pretty_midi.Instrument(program=pretty_midi.instrument_name_to_program(program_name))
+    track.notes = [
+        pretty_midi.Note(velocity=int(velocity), pitch=int(pitch), start=float(start), end=float(end))
+        for start, end, pitch, velocity in notes.tolist()
+    ]
+    pm.instruments.append(track)
+
+    midi_buffer = BytesIO()
+    pm.write(midi_buffer)
+    return midi_buffer.getvalue()
+
+
+def notes_to_music21(notes, bpm=120, grid=0.25):
+    """
+    Render a note array as a music21 stream, timed in quarter notes at bpm
+    Offsets and durations are quantized to grid quarter lengths (sixteenths by default)
+    """
+    score_stream = stream.Stream()
+    score_stream.insert(0, m21_tempo.MetronomeMark(number=bpm))
+
+    quarters_per_second = bpm / 60.0
+    offsets = np.round(notes['start'] * quarters_per_second / grid) * grid
+    lengths = np.maximum(grid, np.round((notes['end'] - notes['start']) * quarters_per_second / grid) * grid)
+    for offset, length, pitch, velocity in zip(offsets.tolist(), lengths.tolist(),
+                                               notes['pitch'].tolist(), notes['velocity'].tolist()):
+        new_note = note.Note(pitch, quarterLength=length)
+        new_note.volume.velocity = velocity
+        score_stream.insert(offset, new_note)
+    return score_stream
@@ -1,59 +1,59 @@
 import cv2
-import tempfile
 import numpy as np
 from PIL import Image
 import io
 import base64
+from .media_ingest import as_media_source
+from .frame_sampler import FrameSampler
 
-def extract_frames(video_file, interval=5):
+# Fractions of the video to pull key frames from
+KEY_MOMENTS = (
+    0.25,  # Quarter way through
+    0.5,   # Midpoint
+    0.75   # Three-quarters through
+)
+
+def extract_frames(video_file, interval=5, moments=KEY_MOMENTS):
     """
     Extracts key frames with very permissive quality checks
+    Seeks straight to each moment and only encodes frames that are returned
     Always returns at least one frame
     """
-    frames = []
-    backup_frames = []  # Store all frames as backup
-    
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-    temp.write(video_file.read())
-    temp.close()
-    
-    cap = cv2.VideoCapture(temp.name)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    # Calculate key moments to analyze
-    key_moments = [
-        int(total_frames * 0.25),  # Quarter way through
-        int(total_frames * 0.5),   # Midpoint
-        int(total_frames * 0.75)   # Three-quarters through
-    ]
-    
-    frame_count = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Convert frame to base64
-        success, buffer = cv2.imencode('.jpg', frame)
-        if success:
-            base64_frame = base64.b64encode(buffer).decode('utf-8')
-            
-            if frame_count in key_moments:
-                if is_frame_usable(frame):
-                    frames.append(base64_frame)
-                backup_frames.append(base64_frame)
-                
-        frame_count += 1
-    
-    cap.release()
-    
-    # If no good frames found, use backup frames
-    if not frames and backup_frames:
-        # Use middle frame as fallback
-        middle_idx = len(backup_frames) // 2
-        frames = [backup_frames[middle_idx]]
-    
-    return frames
+    media, owns_media = as_media_source(video_file)
+    try:
+        total_frames = media.probe()["frame_count"]
+        if total_frames <= 0:
+            return []
+        
+        # Calculate key moments to analyze
+        key_moments = sorted({
+            min(total_frames - 1, int(total_frames * moment))
+            for moment in moments
+        })
+        
+        # Decode only the key moments, grabbing or seeking past everything else
+        sampler = FrameSampler(mode='all')
+        candidates = [
+            frame for _, frame in media.iter_frames(lambda cap: sampler.read_sequential(cap, key_moments))
+        ]
+        
+        frames = [frame for frame in candidates if is_frame_usable(frame)]
+        
+        # If no good frames found, use the middle key frame as fallback
+        if not frames and candidates:
+            frames = [candidates[len(candidates) // 2]]
+        
+        return [encoded for encoded in (encode_frame(frame) for frame in frames) if encoded]
+    finally:
+        if owns_media:
+            media.close()
+
+def encode_frame(frame):
+    """JPEG-encode a frame and return it as a base64 string, or None on failure"""
+    success, buffer = cv2.imencode('.jpg', frame)
+    if not success:
+        return None
+    return base64.b64encode(buffer).decode('utf-8')
 
 def is_frame_usable(frame):
     """
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .analysis_config import VLM_CACHE_PATH, VLM_CACHE_MAX_ENTRIES, VLM_CACHE_MAX_DISTANCE
+from .frame_hash import dhash, hamming_distance
+
+# 16x16 difference hash: fine enough to tell poses apart, coarse enough to ignore noise
+VLM_HASH_SIZE = 16
+VLM_HASH_BITS = VLM_HASH_SIZE * VLM_HASH_SIZE
+
+
+class VLMScoreCache:
+    """
+    Persistent LRU cache of vision-model frame scores
+    Keys are a perceptual hash of the frame sent to the model, scoped to the
+    model id and prompt; lookups accept any stored hash within max_distance bits
+    Near matches are found by multi-index hashing: the hash is cut into
+    max_distance + 1 bands, and any hash within max_distance bits must match the
+    query exactly on at least one band, so only entries sharing a band are compared
+    """
+
+    def __init__(self, path=VLM_CACHE_PATH, max_entries=VLM_CACHE_MAX_ENTRIES,
+                 max_distance=VLM_CACHE_MAX_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (namespace, frame_hash) -> score, most recent last
+        band_count = max(1, max_distance + 1)
+        edges = [round(i * VLM_HASH_BITS / band_count) for i in range(band_count + 1)]
+        self._band_ranges = [(low, (1 << (high - low)) - 1) for low, high in zip(edges, edges[1:])]
+        self._bands = [{} for _ in self._band_ranges]  # (namespace, band bits) -> set of hashes
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def namespace(model, prompt):
+        """Scope for scores produced by one model/prompt pair"""
+        return hashlib.sha1(f"{model}\0{prompt}".encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def frame_hash(frame):
+        return dhash(frame, hash_size=VLM_HASH_SIZE)
+
+    def get(self, frame_hash, namespace):
+        """Return the score of the nearest cached frame within tolerance, or None"""
+        with self._lock:
+            key = (namespace, frame_hash)
+            if key not in self._entries:
+                best_distance = self.max_distance + 1
+                for candidate in self._candidates(frame_hash, namespace):
+                    distance = hamming_distance(candidate, frame_hash)
+                    if distance < best_distance:
+                        key, best_distance = (namespace, candidate), distance
+                if best_distance > self.max_distance:
+                    return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def _band_keys(self, frame_hash, namespace):
+        return [(namespace, (frame_hash >> shift) & mask) for shift, mask in self._band_ranges]
+
+    def _candidates(self, frame_hash, namespace):
+        """Stored hashes in namespace that share at least one band with frame_hash"""
+        candidates = set()
+        for band, band_key in zip(self._bands, self._band_keys(frame_hash, namespace)):
+            candidates.update(band.get(band_key, ()))
+        return candidates
+
+    def put(self, frame_hash, namespace, score):
+        with self._lock:
+            self._store((namespace, frame_hash), score)
+            self._dirty = True
+
+    def _store(self, key, score):
+        """Insert or refresh an entry, evicting the least recently used beyond max_entries"""
+        if key not in self._entries:
+            namespace, frame_hash = key
+            for band, band_key in zip(self._bands, self._band_keys(frame_hash, namespace)):
+                band.setdefault(band_key, set()).add(frame_hash)
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            (namespace, frame_hash), _ = self._entries.popitem(last=False)
+            for band, band_key in zip(self._bands, self._band_keys(frame_hash, namespace)):
+                members = band[band_key]
+                members.discard(frame_hash)
+                if not members:
+                    del band[band_key]
+
+    def save(self):
+        """Write the cache to disk atomically, least recently used first"""
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [[namespace, f"{frame_hash:x}", score]
+                    for (namespace, frame_hash), score in self._entries.items()]
+            self._dirty = False
+
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(rows, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Warning: could not save VLM score cache: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+            for namespace, frame_hash, score in rows[-self.max_entries:]:
+                self._store((namespace, int(frame_hash, 16)), float(score))
+        except Exception as e:
+            print(f"Warning: ignoring unreadable VLM score cache: {e}")
+            self._entries.clear()
+            for band in self._bands:
+                band.clear()
@@ -115,15 +115,15 @@ def format_audio_feedback(gpt_response, technical_data):
             "score": calculate_audio_score(feedback, technical_data),
             "tempo": {
                 "score": feedback["tempo"]["score"],
-                "feedback": feedback["tempo"]["feedback"]
+                "feedback": _as_feedback_list(feedback["tempo"]["feedback"])
             },
             "pitch": {
                 "score": feedback["pitch"]["score"],
-                "feedback": feedback["pitch"]["feedback"]
+                "feedback": _as_feedback_list(feedback["pitch"]["feedback"])
             },
             "rhythm": {
                 "score": feedback["rhythm"]["score"],
-                "feedback": feedback["rhythm"]["feedback"]
+                "feedback": _as_feedback_list(feedback["rhythm"]["feedback"])
             },
             "technical_data": technical_data
         }
@@ -131,6 +131,10 @@ def format_audio_feedback(gpt_response, technical_data):
         print(f"Error formatting audio feedback: {e}")
         return None
 
+def _as_feedback_list(feedback):
+    """GPT returns one feedback string per aspect; the visual branch uses lists"""
+    return [feedback] if isinstance(feedback, str) else list(feedback)
+
 def calculate_audio_score(feedback, technical_data):
     """Calculate overall audio score"""
     scores = [
@@ -149,6 +153,15 @@ def calculate_audio_score(feedback, technical_data):
     base_score = sum(scores) / len(scores)
     return min(10.0, base_score * (1 + technical_bonus * 0.2))
 
+def iter_feedback_aspects(feedback):
+    """
+    Yields (aspect, data) for scored aspects only, skipping the overall
+    score and extras such as timeline or technical_data
+    """
+    for aspect, data in feedback.items():
+        if isinstance(data, dict) and "score" in data and "feedback" in data:
+            yield aspect, data
+
 def format_recommendations(gpt_response):
     """Formats GPT's recommendations into structured advice"""
     # Implementation needed